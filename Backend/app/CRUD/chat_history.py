@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
+from models.chat_history import ChatHistory, ChatSummary
+
+async def append_messages(db: AsyncSession, user_id: int, messages: list) -> list:
+    """
+    Append messages to a user's history in one insert.
+
+    Args:
+        db (AsyncSession): The session to run in; committed before returning.
+        user_id (int): Owner of the messages.
+        messages (list): ``(role, content)`` pairs, oldest first.
+
+    Returns:
+        list: The stored ``ChatHistory`` rows.
+    """
+    now = datetime.utcnow()
+    # Distinct timestamps keep the order of messages appended together.
+    records = [
+        ChatHistory(user_id=user_id, role=role, content=content, created_at=now + timedelta(microseconds=i))
+        for i, (role, content) in enumerate(messages)
+    ]
+    db.add_all(records)
+    await db.commit()
+    return records
+
+async def get_summary(db: AsyncSession, user_id: int) -> ChatSummary | None:
+    # Re-read even if the session already holds the row, which may be stale
+    return await db.get(ChatSummary, user_id, populate_existing=True)
+
+def _unsummarized(user_id: int, summary: ChatSummary | None) -> list:
+    filters = [ChatHistory.user_id == user_id]
+    if summary is not None and summary.summarized_through_at is not None:
+        filters.append(
+            tuple_(ChatHistory.created_at, ChatHistory.id)
+            > tuple_(summary.summarized_through_at, summary.summarized_through_id)
+        )
+    return filters
+
+async def get_unsummarized_messages(
+    db: AsyncSession, user_id: int, summary: ChatSummary | None, limit: int
+) -> list:
+    """
+    The newest ``limit`` messages not yet folded into ``summary``, oldest first.
+
+    Folding keeps this tail short, so the read is a small range scan on
+    ``(user_id, created_at)`` however long the conversation is.
+    """
+    stmt = (
+        select(ChatHistory)
+        .filter(*_unsummarized(user_id, summary))
+        .order_by(ChatHistory.created_at.desc(), ChatHistory.id.desc())
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return list(reversed(result.scalars().all()))
+
+async def get_oldest_unsummarized_messages(
+    db: AsyncSession, user_id: int, summary: ChatSummary | None, limit: int
+) -> list:
+    """The oldest ``limit`` messages not yet folded into ``summary``, oldest first."""
+    stmt = (
+        select(ChatHistory)
+        .filter(*_unsummarized(user_id, summary))
+        .order_by(ChatHistory.created_at, ChatHistory.id)
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+async def count_unsummarized_messages(db: AsyncSession, user_id: int, summary: ChatSummary | None) -> int:
+    stmt = select(func.count()).select_from(ChatHistory).filter(*_unsummarized(user_id, summary))
+    return (await db.execute(stmt)).scalar_one()
+
+async def save_summary(
+    db: AsyncSession, user_id: int, summary: str, through: ChatHistory, previous: ChatSummary | None
+) -> bool:
+    """
+    Replace the user's rolling summary, now covering messages up to ``through``.
+
+    Only applies if the stored summary still covers exactly what ``previous``
+    did, so two workers folding the same messages can't overwrite each other.
+
+    Args:
+        db (AsyncSession): The session to run in; committed before returning.
+        user_id (int): Owner of the summary.
+        summary (str): The new summary text.
+        through (ChatHistory): Last message the new summary covers.
+        previous (ChatSummary | None): The summary the new one was built on.
+
+    Returns:
+        bool: Whether the summary was written.
+    """
+    now = datetime.utcnow()
+    values = {
+        "summary": summary,
+        "summarized_through_at": through.created_at,
+        "summarized_through_id": through.id,
+        "updated_at": now,
+    }
+    previous_id = previous.summarized_through_id if previous is not None else None
+    stmt = insert(ChatSummary).values(user_id=user_id, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ChatSummary.user_id],
+        set_=values,
+        where=ChatSummary.summarized_through_id.is_not_distinct_from(previous_id),
+    ).returning(ChatSummary.user_id)
+    written = (await db.execute(stmt)).first() is not None
+    await db.commit()
+    return written
@@ -0,0 +1,192 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import bindparam, delete, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
+from models.exercise_rollup import ExerciseRollup, ExerciseMistakeRollup
+
+# exercise_name of the rollups that total every exercise
+ALL_EXERCISES = "*"
+# period_start of the all-time rollups
+ALL_TIME = date(1970, 1, 1)
+PERIODS = ("day", "week", "all")
+STAT_COLUMNS = ("sets", "scored_sets", "score_sum", "rep_total")
+MISTAKE_COLUMNS = ("occurrences", "percentage_sum")
+
+def period_start(period: str, workout_date: date) -> date:
+    if period == "day":
+        return workout_date
+    if period == "week":
+        return workout_date - timedelta(days=workout_date.weekday())
+    return ALL_TIME
+
+def _buckets(exercise_name: str, workout_date: date):
+    for scope in (exercise_name, ALL_EXERCISES):
+        for period in PERIODS:
+            yield (scope, period, period_start(period, workout_date))
+
+def _in_buckets(columns, buckets: list):
+    # Spelled out rather than IN (...) so the statement also works with executemany.
+    key = tuple_(*columns)
+    return or_(*(key == tuple_(*bucket) for bucket in buckets))
+
+def _additive_upsert(model, rows: list, key_columns, sum_columns):
+    stmt = insert(model).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[getattr(model, column) for column in key_columns],
+        set_={
+            column: getattr(model, column) + getattr(stmt.excluded, column)
+            for column in sum_columns
+        },
+    )
+
+async def record_sets(db: AsyncSession, user_id: int, sets: list):
+    """
+    Add logged sets to every rollup bucket they fall in.
+
+    Each set counts once toward its day, week and all-time buckets, for its
+    exercise and for the user's total, so a write touches six rollup rows plus
+    six per reported mistake. The buckets are summed in Python and written with
+    one additive upsert per table; nothing is read back. Runs in the caller's
+    transaction and does not commit.
+
+    Args:
+        db (AsyncSession): Session of the write being rolled up.
+        user_id (int): Owner of the sets.
+        sets (list): ``(exercise_name, workout_date, values)`` tuples, with
+            ``values`` holding whichever of ``rep_count``, ``score`` and
+            ``mistake_percentages`` the set reported.
+    """
+    stats, mistakes = {}, {}
+    for exercise_name, workout_date, values in sets:
+        score = values.get("score")
+        reps = values.get("rep_count") or 0
+        reported = values.get("mistake_percentages") or {}
+        for bucket in _buckets(exercise_name, workout_date):
+            totals = stats.setdefault(bucket, dict.fromkeys(STAT_COLUMNS, 0))
+            totals["sets"] += 1
+            totals["rep_total"] += reps
+            if score is not None:
+                totals["scored_sets"] += 1
+                totals["score_sum"] += score
+            for mistake, percentage in reported.items():
+                counts = mistakes.setdefault(bucket + (mistake,), dict.fromkeys(MISTAKE_COLUMNS, 0))
+                counts["occurrences"] += percentage > 0
+                counts["percentage_sum"] += percentage
+    if not stats:
+        return
+
+    key = ("user_id", "exercise_name", "period", "period_start")
+    now = datetime.utcnow()
+    await db.execute(_additive_upsert(
+        ExerciseRollup,
+        [
+            {"user_id": user_id, "exercise_name": b[0], "period": b[1], "period_start": b[2], "last_updated": now, **totals}
+            for b, totals in stats.items()
+        ],
+        key,
+        STAT_COLUMNS,
+    ))
+    if mistakes:
+        await db.execute(_additive_upsert(
+            ExerciseMistakeRollup,
+            [
+                {"user_id": user_id, "exercise_name": b[0], "period": b[1], "period_start": b[2], "mistake": b[3], **counts}
+                for b, counts in mistakes.items()
+            ],
+            key + ("mistake",),
+            MISTAKE_COLUMNS,
+        ))
+
+async def remove_day(db: AsyncSession, user_id: int, exercise_name: str, workout_date: date):
+    """
+    Take a deleted record's sets back out of the rollups.
+
+    The record's day bucket holds exactly its contribution, so it is subtracted
+    from the week, all-time and cross-exercise buckets and then dropped. Runs in
+    the caller's transaction and does not commit.
+    """
+    day = (exercise_name, "day", workout_date)
+    others = [bucket for bucket in _buckets(exercise_name, workout_date) if bucket != day]
+    day_filter = (
+        ExerciseRollup.user_id == user_id,
+        ExerciseRollup.exercise_name == exercise_name,
+        ExerciseRollup.period == "day",
+        ExerciseRollup.period_start == workout_date,
+    )
+    stats = (await db.execute(select(ExerciseRollup).filter(*day_filter))).scalars().first()
+    if stats is None:
+        return
+    bucket_columns = (ExerciseRollup.exercise_name, ExerciseRollup.period, ExerciseRollup.period_start)
+    await db.execute(
+        ExerciseRollup.__table__.update()
+        .where(ExerciseRollup.user_id == user_id, _in_buckets(bucket_columns, others))
+        .values({column: getattr(ExerciseRollup, column) - getattr(stats, column) for column in STAT_COLUMNS})
+    )
+
+    mistake_day_filter = (
+        ExerciseMistakeRollup.user_id == user_id,
+        ExerciseMistakeRollup.exercise_name == exercise_name,
+        ExerciseMistakeRollup.period == "day",
+        ExerciseMistakeRollup.period_start == workout_date,
+    )
+    day_mistakes = (await db.execute(select(ExerciseMistakeRollup).filter(*mistake_day_filter))).scalars().all()
+    if day_mistakes:
+        table = ExerciseMistakeRollup.__table__
+        mistake_buckets = (table.c.exercise_name, table.c.period, table.c.period_start)
+        await db.execute(
+            table.update()
+            .where(
+                table.c.user_id == user_id,
+                _in_buckets(mistake_buckets, others),
+                table.c.mistake == bindparam("m_mistake"),
+            )
+            .values({column: table.c[column] - bindparam(f"m_{column}") for column in MISTAKE_COLUMNS}),
+            [
+                {"m_mistake": row.mistake, **{f"m_{column}": getattr(row, column) for column in MISTAKE_COLUMNS}}
+                for row in day_mistakes
+            ],
+        )
+        await db.execute(delete(ExerciseMistakeRollup).filter(*mistake_day_filter))
+    await db.execute(delete(ExerciseRollup).filter(*day_filter))
+
+async def get_rollups(
+    db: AsyncSession, user_id: int, period: str = "all", start: date | None = None
+) -> list:
+    """
+    A user's rollups for one period, every exercise plus the "*" total.
+
+    Args:
+        db (AsyncSession): Session to query with.
+        user_id (int): Owner of the rollups.
+        period (str): "day", "week" or "all".
+        start (date | None): Any day in the wanted day/week; ignored for "all".
+            Defaults to today.
+    """
+    start = period_start(period, start or datetime.utcnow().date())
+    stmt = select(ExerciseRollup).filter(
+        ExerciseRollup.user_id == user_id,
+        ExerciseRollup.period == period,
+        ExerciseRollup.period_start == start,
+    )
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+async def get_top_mistakes(
+    db: AsyncSession, user_id: int, exercise_name: str = ALL_EXERCISES, limit: int = 3
+) -> list:
+    """The all-time most frequent mistakes of a user, optionally for one exercise."""
+    stmt = (
+        select(ExerciseMistakeRollup)
+        .filter(
+            ExerciseMistakeRollup.user_id == user_id,
+            ExerciseMistakeRollup.exercise_name == exercise_name,
+            ExerciseMistakeRollup.period == "all",
+            ExerciseMistakeRollup.period_start == ALL_TIME,
+            ExerciseMistakeRollup.occurrences > 0,
+        )
+        .order_by(ExerciseMistakeRollup.occurrences.desc())
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().all()
@@ -1,9 +1,13 @@
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, null, tuple_
 from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
 from models.user import User
 from schemas.user_exercise import ExerciseDataCreate, ExerciseDataUpdate
 from models.user_exercise_data import UserExerciseData
+from database import async_session
+from CRUD import rollups
 
     
 async def get_user_exercise_data(db: AsyncSession, user_id: int):
@@ -16,6 +20,88 @@ async def get_user_exercise_data(db: AsyncSession, user_id: int):
             print("MISTAKEE ALSO")
             rec.mistake_percentages = {}
     return records
+# Columns of the history export, in CSV column order
+EXPORT_COLUMNS = (
+    UserExerciseData.id,
+    UserExerciseData.exercise_name,
+    UserExerciseData.workout_date,
+    UserExerciseData.rep_count,
+    UserExerciseData.score,
+    UserExerciseData.total_attempts,
+    UserExerciseData.mistake_percentages,
+    UserExerciseData.created_at,
+    UserExerciseData.last_updated,
+)
+EXPORT_CHUNK_ROWS = 1000
+
+def _history_filters(user_id: int, exercise_name=None, start_date=None, end_date=None) -> list:
+    filters = [UserExerciseData.user_id == user_id]
+    if exercise_name is not None:
+        filters.append(UserExerciseData.exercise_name == exercise_name)
+    if start_date is not None:
+        filters.append(UserExerciseData.workout_date >= start_date)
+    if end_date is not None:
+        filters.append(UserExerciseData.workout_date <= end_date)
+    return filters
+
+async def get_user_exercise_history(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = 50,
+    after=None,
+    exercise_name: str | None = None,
+    start_date=None,
+    end_date=None,
+) -> list:
+    """
+    One page of a user's records ordered by ``(workout_date, id)``.
+
+    Keyset pagination: the page starts strictly after the ``(workout_date, id)``
+    of the previous page's last row, so every page costs one index range scan
+    on ``(user_id, workout_date, id)`` however deep it is.
+
+    Args:
+        db (AsyncSession): Session to query with.
+        user_id (int): Owner of the records.
+        limit (int): Page size.
+        after (tuple | None): ``(workout_date, id)`` of the last row already seen.
+        exercise_name (str | None): Only this exercise.
+        start_date (date | None): First day included.
+        end_date (date | None): Last day included.
+
+    Returns:
+        list: Up to ``limit + 1`` records; an extra row means there is a next page.
+    """
+    stmt = select(UserExerciseData).filter(
+        *_history_filters(user_id, exercise_name, start_date, end_date)
+    )
+    if after is not None:
+        stmt = stmt.filter(tuple_(UserExerciseData.workout_date, UserExerciseData.id) > tuple_(*after))
+    stmt = stmt.order_by(UserExerciseData.workout_date, UserExerciseData.id).limit(limit + 1)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+async def stream_user_exercise_history(
+    user_id: int, exercise_name: str | None = None, start_date=None, end_date=None
+):
+    """
+    Yield a user's records as plain row mappings, ``EXPORT_CHUNK_ROWS`` at a time.
+
+    Rows come from a server-side cursor and are never turned into ORM objects,
+    so memory stays flat whatever the history length. Opens its own session
+    because a streaming response outlives the request's ``get_db`` session.
+    """
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .filter(*_history_filters(user_id, exercise_name, start_date, end_date))
+        .order_by(UserExerciseData.workout_date, UserExerciseData.id)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    async with async_session() as session:
+        result = await session.stream(stmt)
+        async for chunk in result.mappings().partitions():
+            yield chunk
+
 async def get_user_data(
     db: AsyncSession,
     user_id: int
@@ -65,61 +151,167 @@ async def delete_user_exercise_data(
     record = result.scalars().first()
 
     if record:
+        await rollups.remove_day(db, user_id, record.exercise_name, record.workout_date)
         await db.delete(record)
         await db.commit()
         return record
     return None
 
+UPSERT_COLUMNS = ("rep_count", "mistake_percentages", "score")
+
+def _upsert_row(user_id: int, exercise_name: str, values: dict, workout_date, attempts: int, now) -> dict:
+    mistakes = values.get("mistake_percentages")
+    return {
+        "user_id": user_id,
+        "exercise_name": exercise_name,
+        "workout_date": workout_date,
+        "rep_count": values.get("rep_count") or 0,
+        # SQL NULL rather than JSON null, so the upsert's COALESCE keeps the stored value
+        "mistake_percentages": null() if mistakes is None else mistakes,
+        "score": values.get("score") or 0.0,
+        "total_attempts": attempts,
+        "created_at": now,
+        "last_updated": now,
+    }
+
+def _upsert_statement(rows: list, columns):
+    """
+    One multi-row INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
+
+    On conflict only ``columns`` overwrite the stored row, and a NULL in the new
+    row keeps the stored value; ``total_attempts`` grows by each row's own
+    attempt count, all in SQL. Rows must have distinct (user, exercise, day)
+    keys: Postgres rejects a statement that touches the same row twice.
+    """
+    stmt = insert(UserExerciseData).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[
+            UserExerciseData.user_id,
+            UserExerciseData.exercise_name,
+            UserExerciseData.workout_date,
+        ],
+        set_={
+            **{
+                column: func.coalesce(getattr(stmt.excluded, column), getattr(UserExerciseData, column))
+                for column in columns
+            },
+            "total_attempts": func.coalesce(UserExerciseData.total_attempts, 0) + stmt.excluded.total_attempts,
+            "last_updated": stmt.excluded.last_updated,
+        },
+    ).returning(UserExerciseData)
+
+async def upsert_user_exercise_data(
+    db: AsyncSession, user_id: int, exercise_name: str, values: dict, workout_date
+) -> UserExerciseData:
+    """
+    Insert or update the (user, exercise, day) row in one atomic statement, and
+    add the set to the rollups in the same transaction.
+
+    Args:
+        db (AsyncSession): The session to run in; committed before returning.
+        user_id (int): Owner of the record.
+        exercise_name (str): Exercise the record is for.
+        values (dict): Columns to write; on conflict only these overwrite the
+            existing row, and ``total_attempts`` is incremented in SQL.
+        workout_date (date): Day of the record.
+
+    Returns:
+        UserExerciseData: The row as stored after the insert or update.
+    """
+    row = _upsert_row(user_id, exercise_name, values, workout_date, 1, datetime.utcnow())
+    result = await db.execute(
+        _upsert_statement([row], values), execution_options={"populate_existing": True}
+    )
+    record = result.scalars().one()
+    await rollups.record_sets(db, user_id, [(exercise_name, workout_date, values)])
+    await db.commit()
+    return record
+
+async def bulk_upsert_user_exercise_data(db: AsyncSession, user_id: int, items: list) -> dict:
+    """
+    Apply many create/update payloads in one transaction.
+
+    Items for the same (exercise, day) are merged first, later items winning
+    field by field and each counting as one attempt, exactly as if they had been
+    sent one at a time. Items that supply the same set of fields go out as one
+    multi-row upsert (usually a single statement for the whole batch). If a
+    statement fails, its rows are retried one by one under savepoints so only
+    the offending items are reported.
+
+    Args:
+        db (AsyncSession): The session to run in; committed before returning.
+        user_id (int): Owner of every record.
+        items (list): ``(exercise_name, values, workout_date)`` tuples, with
+            ``values`` as for ``upsert_user_exercise_data``.
+
+    Returns:
+        dict: ``(exercise_name, workout_date)`` to the stored ``UserExerciseData``,
+        or to the error message for keys that could not be written.
+    """
+    now = datetime.utcnow()
+    merged = {}
+    for exercise_name, values, workout_date in items:
+        key = (exercise_name, workout_date)
+        entry = merged.setdefault(key, {"values": {}, "sets": []})
+        entry["values"].update(values)
+        entry["sets"].append(values)
+
+    groups = {}
+    for key, entry in merged.items():
+        columns = tuple(column for column in UPSERT_COLUMNS if column in entry["values"])
+        row = _upsert_row(user_id, key[0], entry["values"], key[1], len(entry["sets"]), now)
+        groups.setdefault(columns, []).append((key, row))
+
+    outcome = {}
+    for columns, keyed_rows in groups.items():
+        try:
+            async with db.begin_nested():
+                result = await db.execute(
+                    _upsert_statement([row for _, row in keyed_rows], columns),
+                    execution_options={"populate_existing": True},
+                )
+                for record in result.scalars().all():
+                    outcome[(record.exercise_name, record.workout_date)] = record
+        except Exception:
+            for key, row in keyed_rows:
+                try:
+                    async with db.begin_nested():
+                        result = await db.execute(
+                            _upsert_statement([row], columns),
+                            execution_options={"populate_existing": True},
+                        )
+                        outcome[key] = result.scalars().one()
+                except Exception as e:
+                    outcome[key] = str(getattr(e, "orig", e))
+    # Every item is its own set in the rollups, even when merged into one row.
+    await rollups.record_sets(db, user_id, [
+        (key[0], key[1], values)
+        for key, entry in merged.items()
+        if not isinstance(outcome[key], str)
+        for values in entry["sets"]
+    ])
+    await db.commit()
+    return outcome
+
 async def create_user_exercise_data(
     db: AsyncSession, user_id: int, payload: ExerciseDataCreate
 ):
-    new_record = UserExerciseData(
-        user_id=user_id,
-        exercise_name=payload.exercise_name,
-        rep_count=payload.rep_count,
-        mistake_percentages=payload.mistake_percentages,
-        score = payload.score,
-        total_attempts=1,
-        workout_date=payload.workout_date or datetime.utcnow().date()
-    )
-    db.add(new_record)
-    await db.commit()
-    await db.refresh(new_record)
-    return new_record
+    values = {
+        "rep_count": payload.rep_count,
+        "mistake_percentages": payload.mistake_percentages,
+        "score": payload.score,
+    }
+    workout_date = payload.workout_date or datetime.utcnow().date()
+    return await upsert_user_exercise_data(db, user_id, payload.exercise_name, values, workout_date)
 
 async def update_user_exercise_data(
     db: AsyncSession, user_id: int, exercise_name: str, payload: ExerciseDataUpdate
 ):
     workout_date = payload.workout_date or datetime.utcnow().date()
-    stmt = select(UserExerciseData).filter(
-        UserExerciseData.user_id == user_id,
-        UserExerciseData.exercise_name == exercise_name,
-        UserExerciseData.workout_date == workout_date
-    )
-    result = await db.execute(stmt)
-    record = result.scalars().first()
-
-    if record:
-        if payload.rep_count is not None:
-            record.rep_count = payload.rep_count
-        if payload.mistake_percentages is not None:
-            record.mistake_percentages = payload.mistake_percentages
-        if payload.score is not None:
-            record.score = payload.score
-        
-        record.total_attempts += 1
-    else:
-        record = UserExerciseData(
-            user_id=user_id,
-            exercise_name=exercise_name,
-            rep_count=payload.rep_count or 0,
-            mistake_percentages=payload.mistake_percentages,
-            score=payload.score or 0.0,
-            total_attempts=1,
-            workout_date=workout_date
-        )
-        db.add(record)
-
-    await db.commit()
-    await db.refresh(record)
-    return record
\ No newline at end of file
+    # Fields left out of the payload keep their stored value on update.
+    values = {
+        column: getattr(payload, column)
+        for column in UPSERT_COLUMNS
+        if getattr(payload, column) is not None
+    }
+    return await upsert_user_exercise_data(db, user_id, exercise_name, values, workout_date)
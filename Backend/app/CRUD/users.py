@@ -1,7 +1,7 @@
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from models.user import User
-from core.security import hash_password
+from core.security import hash_password, invalidate_cached_user
 
 async def get_user(db: AsyncSession, user_id: int):
     stmt = select(User).where(User.id == user_id)
@@ -18,14 +18,18 @@ async def get_user_by_username(db: AsyncSession, username: str):
     result = await db.execute(stmt)
     return result.scalars().first()
 
-async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
-    stmt = select(User).offset(skip).limit(limit)
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: int | None = None):
+    # Pass the last id of the previous page as after_id to page by key instead of OFFSET
+    stmt = select(User).order_by(User.id)
+    if after_id is not None:
+        stmt = stmt.where(User.id > after_id)
+    stmt = stmt.offset(skip).limit(limit)
     result = await db.execute(stmt) 
     return result.scalars().all()
 
 # Create a user (async)
 async def create_user(db: AsyncSession, username: str, email: str, password: str):
-    hashed_password = hashed_password(password)
+    hashed_password = await hash_password(password)
     user = User(username=username, email=email, hashed_password=hashed_password)
     db.add(user)
     await db.commit()
@@ -33,7 +37,7 @@ async def create_user(db: AsyncSession, username: str, email: str, password: str
     return user
 
 async def update_user(db: AsyncSession, user_id: int, username: str, email: str, password: str):
-    hashed_password = hash_password(password)
+    hashed_password = await hash_password(password)
     stmt = select(User).where(User.id == user_id)
     result = await db.execute(stmt)
     user = result.scalars().first()
@@ -43,6 +47,7 @@ async def update_user(db: AsyncSession, user_id: int, username: str, email: str,
         user.hashed_password = hashed_password
         await db.commit() 
         await db.refresh(user)  
+        await invalidate_cached_user(user_id)
         return user
     return None
 
@@ -53,5 +58,6 @@ async def delete_user(db: AsyncSession, user_id: int):
     if user:
         await db.delete(user)
         await db.commit() 
+        await invalidate_cached_user(user_id)
         return user
     return None
\ No newline at end of file
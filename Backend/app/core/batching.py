@@ -0,0 +1,108 @@
+import asyncio
+import inspect
+import os
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 32))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 5))
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent single-item requests into one batched call.
+
+    Callers ``await submit(item)`` exactly as they would await a single prediction.
+    Items are collected until ``max_batch_size`` is reached or ``max_wait_ms`` has
+    passed since the first one arrived, then ``batch_fn`` runs once over the whole
+    list and each caller receives its own result.
+
+    ``batch_fn`` takes a list of items and returns a list of results in the same
+    order. It may be a coroutine function; a plain function is run in the default
+    executor so it never blocks the event loop. If a batch raises, its items are
+    retried one by one so a single bad input only fails its own request. A result
+    list of the wrong length can't be matched to its items, so every item of that
+    batch fails with a ``RuntimeError``.
+
+    This module must stay free of app-level imports: it is shared with
+    ``frameProcessing.py``, which imports it as ``Backend.app.core.batching``.
+    """
+
+    def __init__(
+        self,
+        batch_fn,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        max_concurrent_batches: int | None = None,
+        name: str = "",
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.name = name
+        self._is_async = inspect.iscoroutinefunction(batch_fn)
+        self._limit = asyncio.Semaphore(max_concurrent_batches) if max_concurrent_batches else None
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "pending": len(self._pending),
+        }
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _call(self, items):
+        if self._is_async:
+            return await self.batch_fn(items)
+        return await asyncio.get_running_loop().run_in_executor(None, self.batch_fn, items)
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        if self._limit is not None:
+            async with self._limit:
+                await self._resolve(batch)
+        else:
+            await self._resolve(batch)
+
+    async def _resolve(self, batch):
+        try:
+            results = await self._call([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                for pair in batch:
+                    await self._resolve([pair])
+            elif not batch[0][1].done():
+                batch[0][1].set_exception(e)
+            return
+        if len(results) != len(batch):
+            error = RuntimeError(
+                f"{self.name or 'batch_fn'} returned {len(results)} results for {len(batch)} items"
+            )
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
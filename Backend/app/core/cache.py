@@ -0,0 +1,125 @@
+import json
+import os
+import time
+from collections import OrderedDict
+
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", 60))
+CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", 10000))
+# redis://host:port/db of a cache shared by all workers; unset keeps caches in-process.
+CACHE_URL = os.getenv("CACHE_URL")
+
+
+class TTLLRUCache:
+    """
+    In-process cache with a per-entry time to live and least-recently-used eviction.
+
+    The methods are coroutines so it can stand in for ``RedisCache`` (in tests, or
+    single-worker deployments) without callers knowing which one they hold. Values
+    are stored as given; callers that share a cache across workers should keep
+    them JSON-serializable.
+    """
+
+    def __init__(self, max_size: int = CACHE_MAX_SIZE, ttl: float = CACHE_TTL_SECONDS, name: str = ""):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.name = name
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key):
+        self._entries.pop(key, None)
+
+    async def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+class RedisCache:
+    """
+    Cache shared by every worker process, backed by Redis.
+
+    Same interface as ``TTLLRUCache``; values go through JSON, expiry is Redis's
+    and eviction follows the server's ``maxmemory-policy``. Invalidations are seen
+    by all workers at once.
+    """
+
+    def __init__(self, url: str, ttl: float = CACHE_TTL_SECONDS, name: str = ""):
+        # Imported lazily so redis is only required when a shared cache is configured.
+        from redis import asyncio as redis
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+        self.name = name
+        self.prefix = f"{name}:" if name else ""
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key):
+        raw = await self.client.get(self.prefix + str(key))
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key, value):
+        await self.client.set(self.prefix + str(key), json.dumps(value), px=int(self.ttl * 1000))
+
+    async def delete(self, key):
+        await self.client.delete(self.prefix + str(key))
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+def make_cache(name: str, max_size: int = CACHE_MAX_SIZE, ttl: float = CACHE_TTL_SECONDS, url: str | None = CACHE_URL):
+    """A ``RedisCache`` when ``url`` is set, otherwise an in-process ``TTLLRUCache``."""
+    if url:
+        return RedisCache(url, ttl=ttl, name=name)
+    return TTLLRUCache(max_size=max_size, ttl=ttl, name=name)
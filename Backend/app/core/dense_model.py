@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+# Layers that do nothing at inference time
+_PASSTHROUGH_LAYERS = {"InputLayer", "Dropout"}
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    # exp(-|x|) never overflows
+    z = np.exp(-np.abs(x))
+    return np.where(x >= 0, 1 / (1 + z), z / (1 + z))
+
+
+def _softmax(x):
+    x = np.exp(x - x.max(axis=1, keepdims=True))
+    return x / x.sum(axis=1, keepdims=True)
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": _relu,
+    "sigmoid": _sigmoid,
+    "tanh": np.tanh,
+    "softmax": _softmax,
+}
+
+
+def class_labels(outputs) -> np.ndarray:
+    """
+    Turn classifier outputs into class indices.
+
+    A single sigmoid unit is thresholded at 0.5 and several units take the
+    argmax; outputs that are already 1-D labels are returned unchanged.
+    """
+    outputs = np.asarray(outputs)
+    if outputs.ndim == 1:
+        return outputs
+    if outputs.shape[1] == 1:
+        return (outputs[:, 0] > 0.5).astype(np.int64)
+    return outputs.argmax(axis=1)
+
+
+class DenseModel:
+    """
+    A feed-forward stack of dense layers evaluated with NumPy.
+
+    Holds only the float32 weights of a small Keras classifier, so serving it
+    needs neither TensorFlow nor its startup time and memory. ``predict``
+    returns class indices like a scikit-learn classifier; ``predict_proba``
+    returns the output layer's activations.
+    """
+
+    def __init__(self, kernels: list, biases: list, activations: list):
+        if not len(kernels) == len(biases) == len(activations):
+            raise ValueError("Every layer needs a kernel, a bias and an activation")
+        for activation in activations:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation '{activation}'")
+        self.kernels = [np.ascontiguousarray(k, dtype=np.float32) for k in kernels]
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.activations = list(activations)
+        self._functions = [ACTIVATIONS[a] for a in self.activations]
+
+    @property
+    def input_size(self) -> int:
+        return self.kernels[0].shape[0]
+
+    def predict_proba(self, features) -> np.ndarray:
+        x = np.asarray(features, dtype=np.float32).reshape(-1, self.input_size)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self._functions):
+            x = x @ kernel
+            x += bias
+            x = activation(x)
+        return x
+
+    def predict(self, features) -> np.ndarray:
+        return class_labels(self.predict_proba(features))
+
+    def save(self, path: str):
+        arrays = {"activations": np.array(self.activations)}
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays[f"kernel_{i}"] = kernel
+            arrays[f"bias_{i}"] = bias
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "DenseModel":
+        with np.load(path, allow_pickle=False) as data:
+            activations = [str(a) for a in data["activations"]]
+            return cls(
+                [data[f"kernel_{i}"] for i in range(len(activations))],
+                [data[f"bias_{i}"] for i in range(len(activations))],
+                activations,
+            )
+
+    @classmethod
+    def from_keras_h5(cls, path: str) -> "DenseModel":
+        """
+        Read the weights of a Sequential Keras model saved as HDF5, without TensorFlow.
+
+        Args:
+            path (str): A ``model.save("....h5")`` file.
+
+        Raises:
+            ValueError: If the model is not a plain stack of Dense layers
+                (Dropout and InputLayer are skipped).
+        """
+        import h5py
+
+        with h5py.File(path, "r") as model_file:
+            config = json.loads(model_file.attrs["model_config"])
+            if config["class_name"] != "Sequential":
+                raise ValueError(f"{path}: only Sequential models can be exported, not {config['class_name']}")
+            weights = model_file["model_weights"]
+            kernels, biases, activations = [], [], []
+            for layer in config["config"]["layers"]:
+                kind, layer_config = layer["class_name"], layer["config"]
+                if kind in _PASSTHROUGH_LAYERS:
+                    continue
+                if kind != "Dense":
+                    raise ValueError(f"{path}: unsupported layer {kind} '{layer_config['name']}'")
+                datasets = {}
+
+                def collect(name, item):
+                    # "dense/sequential/dense/kernel" or "dense/kernel:0" -> "kernel"
+                    if isinstance(item, h5py.Dataset):
+                        datasets[name.rsplit("/", 1)[-1].split(":")[0]] = item[()]
+
+                weights[layer_config["name"]].visititems(collect)
+                kernels.append(datasets["kernel"])
+                biases.append(datasets.get("bias", np.zeros(datasets["kernel"].shape[1], np.float32)))
+                activation = layer_config.get("activation", "linear")
+                activations.append(activation if isinstance(activation, str) else activation["config"]["name"])
+        return cls(kernels, biases, activations)
+
+
+def exported_path(path: str) -> str:
+    """Where the NumPy export of a Keras model file lives: next to it, as ``.npz``."""
+    return os.path.splitext(path)[0] + ".npz"
+
+
+def _latency_ms(predict, features, repeat: int = 50) -> float:
+    predict(features)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        predict(features)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def verify(path: str, samples: int = 1000, atol: float = 1e-4, seed: int = 0) -> dict:
+    """
+    Compare a NumPy export with the original Keras model on random inputs.
+
+    Needs TensorFlow, which serving does not. Inputs are standard normal,
+    the range of scaled features and wider than raw landmark coordinates.
+
+    Args:
+        path (str): The Keras ``.h5`` file; its export is ``exported_path(path)``.
+        samples (int): Number of random feature rows.
+        atol (float): Largest accepted absolute difference in output probability.
+
+    Returns:
+        dict: Differences, label agreement, latency of both, and ``ok``.
+    """
+    from core.model_registry import load_keras
+
+    dense = DenseModel.load(exported_path(path))
+    keras_model = load_keras(path)
+    features = np.random.default_rng(seed).standard_normal((samples, dense.input_size)).astype(np.float32)
+
+    expected = np.asarray(keras_model.predict(features, verbose=0))
+    actual = dense.predict_proba(features)
+    max_diff = float(np.abs(expected - actual).max())
+    agreement = float((class_labels(expected) == class_labels(actual)).mean())
+    single = features[:1]
+    return {
+        "model": path,
+        "samples": samples,
+        "max_abs_diff": max_diff,
+        "label_agreement": agreement,
+        "keras_ms_per_call": _latency_ms(lambda x: keras_model.predict(x, verbose=0), single),
+        "numpy_ms_per_call": _latency_ms(dense.predict_proba, single),
+        "ok": max_diff <= atol and agreement == 1.0,
+    }
+
+
+def main(argv=None):
+    from core.model_registry import MODELS_DIR, KERAS_MODELS
+
+    parser = argparse.ArgumentParser(
+        description="Export Keras dense classifiers to NumPy weights and check them against the originals.",
+    )
+    parser.add_argument("command", choices=["export", "verify"])
+    parser.add_argument(
+        "models", nargs="*",
+        help=f"Keras .h5 files, relative to {MODELS_DIR} (default: every served Keras model)",
+    )
+    parser.add_argument("--samples", type=int, default=1000, help="Random inputs compared by verify")
+    parser.add_argument("--atol", type=float, default=1e-4, help="Largest accepted probability difference")
+    args = parser.parse_args(argv)
+
+    paths = [p if os.path.isabs(p) else os.path.join(MODELS_DIR, p) for p in args.models or KERAS_MODELS.values()]
+    failed = False
+    for path in paths:
+        if args.command == "export":
+            model = DenseModel.from_keras_h5(path)
+            model.save(exported_path(path))
+            print(f"{path} -> {exported_path(path)} ({len(model.kernels)} dense layers, {model.input_size} inputs)")
+        else:
+            result = verify(path, samples=args.samples, atol=args.atol)
+            failed |= not result["ok"]
+            print(json.dumps(result))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+from .landmarks import (
+    LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+    LEFT_HIP, RIGHT_HIP, RIGHT_KNEE,
+)
+from .rules import ExerciseRules, Angle, Distance, Slope, Below, Above, All, Any, Flag
+
+# Joint angles shared by most exercises
+ARM_ANGLES = {
+    "left_elbow": Angle(LEFT_WRIST, LEFT_ELBOW, LEFT_SHOULDER),
+    "right_elbow": Angle(RIGHT_WRIST, RIGHT_ELBOW, RIGHT_SHOULDER),
+}
+TORSO_ANGLES = {
+    "left_shoulder": Angle(LEFT_ELBOW, LEFT_SHOULDER, LEFT_HIP),
+    "right_shoulder": Angle(RIGHT_ELBOW, RIGHT_SHOULDER, RIGHT_HIP),
+}
+# Upper arm against the shoulder line, for elbows flaring away from the body
+SHOULDER_LINE_ANGLES = {
+    "left_shoulder_line": Angle(RIGHT_SHOULDER, LEFT_SHOULDER, LEFT_ELBOW),
+    "right_shoulder_line": Angle(LEFT_SHOULDER, RIGHT_SHOULDER, RIGHT_ELBOW),
+}
+
+def both_below(threshold, left="left_elbow", right="right_elbow"):
+    return All(Below(left, threshold), Below(right, threshold))
+
+def both_above(threshold, left="left_elbow", right="right_elbow"):
+    return All(Above(left, threshold), Above(right, threshold))
+
+def either_below(threshold, left="left_elbow", right="right_elbow"):
+    return Any(Below(left, threshold), Below(right, threshold))
+
+def either_above(threshold, left="left_elbow", right="right_elbow"):
+    return Any(Above(left, threshold), Above(right, threshold))
+
+
+LATERAL_RAISES = ExerciseRules(
+    features={**ARM_ANGLES, **TORSO_ANGLES, "hip": Angle(RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE)},
+    flags={
+        "curved_arms": either_below(100),
+        "standing_upright": Above("hip", 160),
+        "breakpoint": both_above(75, "left_shoulder", "right_shoulder"),
+        "initial_position": both_below(30, "left_shoulder", "right_shoulder"),
+    },
+)
+
+SHOULDER_PRESS = ExerciseRules(
+    features={**ARM_ANGLES, **SHOULDER_LINE_ANGLES},
+    flags={
+        "arms_too_wide": either_above(150, "left_shoulder_line", "right_shoulder_line"),
+        "breakpoint": both_above(160),
+        "initial_position": both_below(90),
+    },
+)
+
+CABLE_LATERAL_RAISES = ExerciseRules(
+    features={**ARM_ANGLES, **TORSO_ANGLES, "torso_slope": Slope(LEFT_SHOULDER, LEFT_HIP)},
+    flags={
+        "bent_arms": either_below(100),
+        "leaning_body": Below("torso_slope", 20),
+        "breakpoint": either_above(75, "left_shoulder", "right_shoulder"),
+        "initial_position": both_below(30, "left_shoulder", "right_shoulder"),
+    },
+)
+
+BENCH_PRESS = ExerciseRules(
+    features={
+        **ARM_ANGLES,
+        "shoulder_width": Distance(LEFT_SHOULDER, RIGHT_SHOULDER),
+        "wrist_width": Distance(LEFT_WRIST, RIGHT_WRIST),
+    },
+    flags={
+        "wrists_too_narrow": Below("wrist_width", "shoulder_width", scale=1.1),
+        "breakpoint": both_above(160),
+        "initial_position": both_below(90),
+    },
+)
+
+INCLINED_DUMBBELL_PRESS = ExerciseRules(
+    features={**ARM_ANGLES, **TORSO_ANGLES},
+    flags={
+        "flared_elbows": either_above(45, "left_shoulder", "right_shoulder"),
+        "breakpoint": both_above(170),
+        "initial_position": both_below(90),
+    },
+)
+
+CABLE_CROSSOVER = ExerciseRules(
+    features={**ARM_ANGLES, **TORSO_ANGLES},
+    flags={
+        "bent_arms_at_breakpoint": All(Flag("breakpoint"), either_below(160)),
+        "breakpoint": both_below(60, "left_shoulder", "right_shoulder"),
+        "initial_position": both_above(90, "left_shoulder", "right_shoulder"),
+    },
+)
+
+ROPE_OVERHEAD_EXTENSIONS = ExerciseRules(
+    features={**ARM_ANGLES, **SHOULDER_LINE_ANGLES},
+    flags={
+        "flared_elbows": either_above(90, "left_shoulder_line", "right_shoulder_line"),
+        "breakpoint": both_above(170),
+        "initial_position": both_below(80),
+    },
+)
+
+# Keyed by the URL slug used by the frame endpoints
+EXERCISE_RULES = {
+    "lateral-raises": LATERAL_RAISES,
+    "shoulder-press": SHOULDER_PRESS,
+    "cable-lateral-raises": CABLE_LATERAL_RAISES,
+    "bench-press": BENCH_PRESS,
+    "inclined-dumbbell-press": INCLINED_DUMBBELL_PRESS,
+    "cable-crossover": CABLE_CROSSOVER,
+    "rope-overhead-extensions": ROPE_OVERHEAD_EXTENSIONS,
+}
@@ -0,0 +1,117 @@
+import os
+from collections import OrderedDict
+import numpy as np
+
+# Opt-in. Results kept per session by the landmark label cache; above 0 it also
+# lets pose tracking sessions reuse the previous frame's landmarks when the
+# frame is unchanged. 0 disables both.
+FRAME_CACHE_SIZE = int(os.getenv("FRAME_CACHE_SIZE", 0))
+# Frame hashes at most this many bits apart (of HASH_SIZE * HASH_SIZE) count as the same frame.
+FRAME_CACHE_MAX_DISTANCE = int(os.getenv("FRAME_CACHE_MAX_DISTANCE", 2))
+# Landmark coordinates are rounded to this step (normalized units) before comparison.
+FRAME_CACHE_LANDMARK_STEP = float(os.getenv("FRAME_CACHE_LANDMARK_STEP", 0.005))
+# Side of the difference hash grid; the hash has HASH_SIZE * HASH_SIZE bits.
+HASH_SIZE = 16
+
+
+class CacheMetrics:
+    """Hit and miss counts shared by many short-lived frame caches."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else None}
+
+
+class FrameResultCache:
+    """
+    Least-recently-used results of one session's recent frames.
+
+    Keys are frame signatures: an ``int`` hash from ``frame_hash``, or ``bytes``
+    from ``quantize_landmarks``. Integer keys within ``max_distance`` bits of a
+    stored one also hit, so sensor noise does not defeat the cache while the
+    person holds still. Pose trackers use ``max_size=1``, comparing each frame
+    only with the last one that was actually estimated, so a slow movement
+    cannot drift through a chain of near matches. Synchronous and not
+    thread-safe: it belongs to one session.
+    """
+
+    def __init__(self, max_size: int = FRAME_CACHE_SIZE, max_distance: int = FRAME_CACHE_MAX_DISTANCE, metrics: CacheMetrics | None = None):
+        self.max_size = max_size
+        self.max_distance = max_distance
+        self.metrics = metrics
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _find(self, key):
+        if key in self._entries:
+            return key
+        if self.max_distance and isinstance(key, int):
+            for stored in reversed(self._entries):
+                if (stored ^ key).bit_count() <= self.max_distance:
+                    return stored
+        return None
+
+    def get(self, key):
+        found = self._find(key)
+        hit = found is not None
+        self.hits += hit
+        self.misses += not hit
+        if self.metrics is not None:
+            self.metrics.hits += hit
+            self.metrics.misses += not hit
+        if not hit:
+            return None
+        self._entries.move_to_end(found)
+        return self._entries[found]
+
+    def set(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+
+def frame_hash(frame: np.ndarray, is_rgb: bool = False, crop: tuple | None = None) -> int:
+    """
+    Difference hash of a decoded frame: which of each pair of neighbouring cells is brighter.
+
+    Args:
+        frame (np.ndarray): A uint8 (H, W, 3) image, BGR unless ``is_rgb``.
+        is_rgb (bool): Whether ``frame`` is RGB.
+        crop (tuple | None): Normalized ``(x0, y0, x1, y1)`` region to hash,
+            such as a tracker's crop around the person, instead of the whole frame.
+
+    Returns:
+        int: A ``HASH_SIZE * HASH_SIZE``-bit hash.
+    """
+    import cv2
+
+    if crop is not None:
+        height, width = frame.shape[:2]
+        x0, y0 = int(crop[0] * width), int(crop[1] * height)
+        x1, y1 = max(x0 + 1, int(np.ceil(crop[2] * width))), max(y0 + 1, int(np.ceil(crop[3] * height)))
+        frame = frame[y0:y1, x0:x1]
+    small = cv2.resize(frame, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    small = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY if is_rgb else cv2.COLOR_BGR2GRAY)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def quantize_landmarks(features: np.ndarray, step: float = FRAME_CACHE_LANDMARK_STEP) -> bytes:
+    """Round a landmark feature vector to ``step`` and pack it as a hashable key."""
+    return np.round(np.asarray(features, dtype=np.float64) / step).astype(np.int32).tobytes()
@@ -0,0 +1,57 @@
+import numpy as np
+
+
+def joint_index(triplets) -> np.ndarray:
+    """
+    Build the index array for ``joint_angles``/``joint_distances`` once, up front.
+
+    Args:
+        triplets: A sequence of landmark index tuples (ints or enums with ``.value``).
+
+    Returns:
+        np.ndarray: An int array of shape (K, len(tuple)).
+    """
+    return np.array(
+        [[getattr(part, "value", part) for part in joints] for joints in triplets],
+        dtype=np.intp,
+    )
+
+
+def joint_angles(landmarks: np.ndarray, triplets: np.ndarray) -> np.ndarray:
+    """
+    Angle in degrees at the middle joint of every (a, b, c) triplet, in one pass.
+
+    Args:
+        landmarks (np.ndarray): (33, D) for one frame or (F, 33, D) for a batch, D >= 3;
+            only x, y, z are used.
+        triplets (np.ndarray): (K, 3) landmark indices, as built by ``joint_index``.
+
+    Returns:
+        np.ndarray: (K,) angles for one frame or (F, K) for a batch.
+    """
+    points = landmarks[..., :3]
+    a = points[..., triplets[:, 0], :]
+    b = points[..., triplets[:, 1], :]
+    c = points[..., triplets[:, 2], :]
+    ba = a - b
+    bc = c - b
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cosine = np.einsum("...i,...i->...", ba, bc) / (
+            np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1)
+        )
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+def joint_distances(landmarks: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    """
+    Euclidean 3D distance for every (a, b) pair, in one pass.
+
+    Args:
+        landmarks (np.ndarray): (33, D) or (F, 33, D), D >= 3.
+        pairs (np.ndarray): (K, 2) landmark indices.
+
+    Returns:
+        np.ndarray: (K,) distances for one frame or (F, K) for a batch.
+    """
+    points = landmarks[..., :3]
+    return np.linalg.norm(points[..., pairs[:, 0], :] - points[..., pairs[:, 1], :], axis=-1)
@@ -0,0 +1,152 @@
+import numpy as np
+
+# MediaPipe Pose landmark indices, so core modules don't need the mediapipe enums.
+NOSE = 0
+LEFT_EYE_INNER = 1
+LEFT_EYE = 2
+LEFT_EYE_OUTER = 3
+RIGHT_EYE_INNER = 4
+RIGHT_EYE = 5
+RIGHT_EYE_OUTER = 6
+LEFT_EAR = 7
+RIGHT_EAR = 8
+MOUTH_LEFT = 9
+MOUTH_RIGHT = 10
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_ELBOW = 13
+RIGHT_ELBOW = 14
+LEFT_WRIST = 15
+RIGHT_WRIST = 16
+LEFT_PINKY = 17
+RIGHT_PINKY = 18
+LEFT_INDEX = 19
+RIGHT_INDEX = 20
+LEFT_THUMB = 21
+RIGHT_THUMB = 22
+LEFT_HIP = 23
+RIGHT_HIP = 24
+LEFT_KNEE = 25
+RIGHT_KNEE = 26
+LEFT_ANKLE = 27
+RIGHT_ANKLE = 28
+LEFT_HEEL = 29
+RIGHT_HEEL = 30
+LEFT_FOOT_INDEX = 31
+RIGHT_FOOT_INDEX = 32
+
+NUM_LANDMARKS = 33
+
+# Columns of a landmark array
+X = 0
+Y = 1
+Z = 2
+VISIBILITY = 3
+LANDMARK_COLUMNS = 4
+COLUMN_NAMES = ("x", "y", "z", "visibility")
+
+
+def pose_to_array(pose_landmarks, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Convert MediaPipe's landmark list into a contiguous float32 (33, 4) array.
+
+    This is the only place landmark attributes are read one by one; everything
+    downstream (rules, geometry, classifier features) indexes the array.
+
+    Args:
+        pose_landmarks: ``results.pose_landmarks.landmark`` from ``Pose.process``.
+        out (np.ndarray | None): Optional preallocated (33, 4) float32 array to fill.
+
+    Returns:
+        np.ndarray: Rows in landmark index order, columns x, y, z, visibility.
+    """
+    values = np.fromiter(
+        (v for lm in pose_landmarks for v in (lm.x, lm.y, lm.z, lm.visibility)),
+        dtype=np.float32,
+        count=NUM_LANDMARKS * LANDMARK_COLUMNS,
+    ).reshape(NUM_LANDMARKS, LANDMARK_COLUMNS)
+    if out is None:
+        return values
+    out[...] = values
+    return out
+
+
+def points_to_array(points) -> np.ndarray:
+    """
+    Convert client-sent points into a float32 (N, C) array.
+
+    Accepts rows of numbers (``[[x, y, z], ...]``) or the ``{"x", "y", "z"}``
+    objects the web client sends, optionally with ``visibility``. A ``landmark``
+    index on the objects is not a column; see ``point_landmarks``.
+    """
+    if points and isinstance(points[0], dict):
+        keys = ("x", "y", "z", "visibility") if "visibility" in points[0] else ("x", "y", "z")
+        return np.array([[p[k] for k in keys] for p in points], dtype=np.float32)
+    return np.asarray(points, dtype=np.float32)
+
+
+def point_landmarks(points) -> list | None:
+    """The MediaPipe landmark index of each client-sent point, or None if the points are unnamed."""
+    if points and isinstance(points[0], dict) and "landmark" in points[0]:
+        return [int(p["landmark"]) for p in points]
+    return None
+
+
+class FeatureSpec:
+    """The landmarks and columns a classifier was trained on, in training order."""
+
+    def __init__(self, landmarks, columns: int):
+        self.landmarks = np.array(landmarks, dtype=np.intp)
+        self.columns = columns
+
+    @property
+    def size(self) -> int:
+        """Length of one feature row."""
+        return len(self.landmarks) * self.columns
+
+    def select(self, landmarks: np.ndarray) -> np.ndarray:
+        """Feature rows from full (33, C) or (F, 33, C) landmark arrays: (N,) or (F, N)."""
+        selected = landmarks[..., self.landmarks, :self.columns]
+        return selected.reshape(*selected.shape[:-2], -1)
+
+    def select_points(self, points: np.ndarray, landmarks: list | None = None) -> np.ndarray:
+        """
+        The feature row from a (N, C) array of just the model's landmarks.
+
+        Named points (``landmarks`` gives each row's landmark index) are put in
+        training order whatever order they came in; unnamed points must already
+        be in training order. Columns beyond ``columns`` are dropped; too few
+        columns is an error rather than a silently shorter row.
+        """
+        if landmarks is not None:
+            row_of = {landmark: row for row, landmark in enumerate(landmarks)}
+            missing = [int(landmark) for landmark in self.landmarks if landmark not in row_of]
+            if missing:
+                raise ValueError(f"missing points for landmarks {missing}")
+            points = points[[row_of[landmark] for landmark in self.landmarks]]
+        if points.ndim != 2 or len(points) != len(self.landmarks):
+            raise ValueError(f"expected {len(self.landmarks)} points, got {len(points)}")
+        if points.shape[1] < self.columns:
+            raise ValueError(
+                f"expected {', '.join(COLUMN_NAMES[:self.columns])} for each point, "
+                f"got {points.shape[1]} values per point"
+            )
+        return points[:, :self.columns].reshape(-1)
+
+
+# Inputs of the landmark classifiers served by routes/exercises.py
+MODEL_FEATURES = {
+    "plank": FeatureSpec([
+        NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+        LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE,
+        LEFT_HEEL, RIGHT_HEEL, LEFT_FOOT_INDEX, RIGHT_FOOT_INDEX,
+    ], columns=4),
+    "bicep_curls": FeatureSpec([
+        NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, RIGHT_ELBOW, LEFT_ELBOW,
+        RIGHT_WRIST, LEFT_WRIST, LEFT_HIP, RIGHT_HIP,
+    ], columns=3),
+    "lunges": FeatureSpec([
+        LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE,
+        LEFT_HEEL, RIGHT_HEEL, LEFT_FOOT_INDEX, RIGHT_FOOT_INDEX,
+    ], columns=4),
+}
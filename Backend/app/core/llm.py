@@ -0,0 +1,327 @@
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import time
+import httpx
+from dotenv import load_dotenv
+from core.cache import make_cache
+
+load_dotenv()
+
+# "openai" talks to any OpenAI-compatible completions API at LLM_BASE_URL
+# (point it at a local stub server in tests); "stub" answers without any network.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.openai.com/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "text-davinci-003")
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", 150))
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", 0.7))
+# Requests in flight to the provider at once, per worker
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", 0.5))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", 8))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 600))
+LLM_CACHE_MAX_SIZE = int(os.getenv("LLM_CACHE_MAX_SIZE", 1000))
+
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """The language model could not produce a completion."""
+
+    def __init__(self, message: str, status_code: int = 502):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMBackend:
+    """Interface of a completion provider."""
+
+    name = "base"
+
+    async def complete(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def stream(self, prompt: str):
+        """Yield the completion in pieces as they are generated; by default all at once."""
+        yield await self.complete(prompt)
+
+    async def aclose(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class StubBackend(LLMBackend):
+    """Deterministic local stand-in, for tests and offline development."""
+
+    name = "stub"
+
+    def __init__(self, reply: str = "This is a stub response. Keep up the good work!"):
+        self.reply = reply
+        self.calls = 0
+
+    async def complete(self, prompt: str) -> str:
+        self.calls += 1
+        return self.reply
+
+    async def stream(self, prompt: str):
+        self.calls += 1
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "calls": self.calls}
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    OpenAI-compatible completions API over one long-lived, pooled HTTP client.
+
+    The client keeps connections (and their TLS sessions) open between messages
+    and speaks HTTP/2 when the ``h2`` package is installed. At most
+    ``max_concurrency`` requests are in flight; the rest queue on a semaphore.
+    Timeouts, connection errors and retryable statuses (429, 5xx) are retried
+    with exponential backoff and full jitter, honouring ``Retry-After``.
+    """
+
+    name = "openai"
+
+    def __init__(
+        self,
+        base_url: str = LLM_BASE_URL,
+        api_key: str | None = None,
+        model: str = LLM_MODEL,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+    ):
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY")
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.http2 = importlib.util.find_spec("h2") is not None
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=self.http2,
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+        )
+        self._slots = None
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+
+    def _payload(self, prompt: str) -> dict:
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "max_tokens": LLM_MAX_TOKENS,
+            "temperature": LLM_TEMPERATURE,
+        }
+
+    def _headers(self) -> dict:
+        if not self.api_key:
+            raise LLMError("OPENAI_API_KEY environment variable is not set.", status_code=500)
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def _backoff(self, attempt: int, response: httpx.Response | None = None) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), LLM_RETRY_MAX_SECONDS)
+        return random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+
+    async def _send(self, path: str, payload: dict, stream: bool = False) -> httpx.Response:
+        """
+        POST with retries; the caller must hold a concurrency slot.
+
+        With ``stream`` the body is left unread so tokens can be consumed as they
+        arrive; retries then only cover failures before the first byte.
+        """
+        headers = self._headers()
+        for attempt in range(self.max_retries + 1):
+            self.requests += 1
+            try:
+                request = self.client.build_request("POST", path, json=payload, headers=headers)
+                response = await self.client.send(request, stream=stream)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt == self.max_retries:
+                    self.failures += 1
+                    raise LLMError(f"Language model API unreachable: {e}", status_code=504) from e
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            if response.is_error:
+                if stream:
+                    await response.aread()
+                    await response.aclose()
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                    self.retries += 1
+                    await asyncio.sleep(self._backoff(attempt, response))
+                    continue
+                self.failures += 1
+                raise LLMError(f"OpenAI API error: {response.text}", status_code=response.status_code)
+            return response
+
+    def _acquire_slot(self):
+        if self._slots is None:
+            # Created lazily so it binds to the running loop.
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._slots
+
+    async def complete(self, prompt: str) -> str:
+        async with self._acquire_slot():
+            self.in_flight += 1
+            started_at = time.perf_counter()
+            try:
+                response = await self._send("/completions", self._payload(prompt))
+            finally:
+                self.in_flight -= 1
+                self.total_seconds += time.perf_counter() - started_at
+        data = response.json()
+        if "choices" in data and len(data["choices"]) > 0:
+            return data["choices"][0]["text"].strip()
+        raise LLMError("Unexpected response format from language model API.", status_code=500)
+
+    async def stream(self, prompt: str):
+        """Yield text deltas from the API's server-sent events as they arrive."""
+        async with self._acquire_slot():
+            self.in_flight += 1
+            started_at = time.perf_counter()
+            try:
+                response = await self._send("/completions", {**self._payload(prompt), "stream": True}, stream=True)
+                try:
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        choices = json.loads(data).get("choices") or []
+                        if choices and choices[0].get("text"):
+                            yield choices[0]["text"]
+                except httpx.HTTPError as e:
+                    self.failures += 1
+                    raise LLMError(f"Language model stream interrupted: {e}", status_code=502) from e
+                except (ValueError, AttributeError, IndexError, KeyError, TypeError) as e:
+                    # A malformed event (bad JSON, unexpected shape) ends the stream the same way.
+                    self.failures += 1
+                    raise LLMError(f"Malformed language model stream event: {e!r}", status_code=502) from e
+                finally:
+                    await response.aclose()
+            finally:
+                self.in_flight -= 1
+                self.total_seconds += time.perf_counter() - started_at
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "http2": self.http2,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "busy_seconds": round(self.total_seconds, 3),
+        }
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace and case so trivially different prompts share a cache entry."""
+    return " ".join(prompt.split()).lower()
+
+
+class LLMClient:
+    """
+    The chatbot's entry point to the language model: a backend plus a response cache.
+
+    A full chat prompt embeds the conversation so far and is different on every
+    turn, so completions are not cached by prompt. A caller that wants caching
+    passes a ``cache_key`` built from the question and the context the answer
+    depends on (see ``cache_key``); calls without one always reach the provider.
+    """
+
+    def __init__(self, backend: LLMBackend, cache=None):
+        self.backend = backend
+        self.cache = cache if cache is not None else make_cache(
+            "llm", max_size=LLM_CACHE_MAX_SIZE, ttl=LLM_CACHE_TTL_SECONDS
+        )
+
+    @staticmethod
+    def cache_key(question: str, context: str = "") -> str:
+        """
+        Cache key for a question asked against a given context.
+
+        Args:
+            question (str): The user's question; normalized like ``normalize_prompt``.
+            context (str): What the answer depends on besides the question. Leave
+                out anything that changes every turn, such as chat history.
+
+        Returns:
+            str: A hex digest combining the question and a fingerprint of the context.
+        """
+        fingerprint = hashlib.sha256(context.encode()).hexdigest()
+        return hashlib.sha256(f"{normalize_prompt(question)}\0{fingerprint}".encode()).hexdigest()
+
+    async def complete(self, prompt: str, cache_key: str | None = None) -> str:
+        if cache_key is None:
+            return await self.backend.complete(prompt)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        text = await self.backend.complete(prompt)
+        if text:
+            await self.cache.set(cache_key, text)
+        return text
+
+    async def stream(self, prompt: str, cache_key: str | None = None):
+        """
+        Yield the completion as it is generated.
+
+        With a ``cache_key``, a cached completion is replayed in one piece and a
+        fresh one is cached once the stream has finished.
+        """
+        if cache_key is not None:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        pieces = []
+        async for piece in self.backend.stream(prompt):
+            pieces.append(piece)
+            yield piece
+        text = "".join(pieces).strip()
+        if text and cache_key is not None:
+            await self.cache.set(cache_key, text)
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+    def stats(self) -> dict:
+        return {**self.backend.stats(), "cache": self.cache.stats()}
+
+
+def make_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    if name == "stub":
+        return StubBackend()
+    if name == "openai":
+        return OpenAIBackend()
+    raise ValueError(f"Unknown LLM_BACKEND: {name}")
+
+
+llm_client = LLMClient(make_backend())
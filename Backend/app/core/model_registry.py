@@ -0,0 +1,186 @@
+import os
+import pickle
+import threading
+import time
+from core.dense_model import DenseModel, exported_path
+
+MODELS_DIR = os.getenv(
+    "MODELS_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "models")),
+)
+# Seconds between mtime checks for a resident model; 0 checks on every access.
+MODEL_RELOAD_CHECK_SECONDS = float(os.getenv("MODEL_RELOAD_CHECK_SECONDS", 2))
+
+
+def _rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def load_pickle(path):
+    with open(path, 'rb') as model_file:
+        return pickle.load(model_file)
+
+
+def load_keras(path):
+    # Imported lazily so TensorFlow is only pulled in when a Keras model is registered.
+    from tensorflow.keras.models import load_model
+    return load_model(path, compile=False)
+
+
+def load_dense(path):
+    return DenseModel.load(path)
+
+
+def default_loader(path):
+    if path.endswith(".npz"):
+        return load_dense(path)
+    if path.endswith((".h5", ".keras")):
+        return load_keras(path)
+    return load_pickle(path)
+
+
+class _Entry:
+    def __init__(self, name, path, loader):
+        self.name = name
+        self.path = path
+        self.loader = loader
+        self.model = None
+        self.mtime = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.memory_bytes = None
+        self.load_count = 0
+        self.last_checked = 0.0
+        self.last_error = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of deserialized models.
+
+    Each model is loaded once (at startup via ``load_all`` or on first ``get``) and
+    kept resident. When the file's mtime changes the model is reloaded on the next
+    access, so a retrained model can be dropped in place without a restart.
+    """
+
+    def __init__(self, check_interval: float = MODEL_RELOAD_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self._entries = {}
+        # Loads run one at a time so each RSS delta belongs to a single model.
+        self._load_lock = threading.Lock()
+
+    def register(self, name: str, path: str, loader=default_loader):
+        """
+        Register a model file under ``name``.
+
+        A Keras model with a NumPy export next to it (see ``core.dense_model``)
+        is served from the export, so TensorFlow is never imported.
+        """
+        if not os.path.isabs(path):
+            path = os.path.join(MODELS_DIR, path)
+        exported = exported_path(path)
+        if loader is default_loader and path.endswith((".h5", ".keras")) and os.path.exists(exported):
+            path = exported
+        self._entries[name] = _Entry(name, path, loader)
+
+    def get(self, name: str):
+        """
+        Return the resident model, loading or hot-reloading it if needed.
+
+        Loading blocks, so call this from a worker thread rather than the event
+        loop (the classifier batchers already run there).
+
+        Args:
+            name (str): The name the model was registered under.
+
+        Returns:
+            The deserialized model object.
+
+        Raises:
+            KeyError: If no model is registered under ``name``.
+        """
+        entry = self._entries[name]
+        now = time.monotonic()
+        if entry.model is not None and now - entry.last_checked < self.check_interval:
+            return entry.model
+
+        with entry.lock:
+            entry.last_checked = now
+            try:
+                mtime = os.stat(entry.path).st_mtime
+            except OSError:
+                # Keep serving the resident copy if the file is briefly missing mid-deploy.
+                if entry.model is not None:
+                    return entry.model
+                raise
+            if entry.model is None or mtime != entry.mtime:
+                self._load(entry, mtime)
+        return entry.model
+
+    def load_all(self):
+        """Eagerly load every registered model; failures are reported and retried on first use."""
+        for name in self._entries:
+            try:
+                self.get(name)
+            except Exception as e:
+                self._entries[name].last_error = str(e)
+                print(f"Could not load model '{name}': {e}")
+
+    def stats(self) -> dict:
+        return {
+            entry.name: {
+                "path": entry.path,
+                "loaded": entry.model is not None,
+                "loaded_at": entry.loaded_at,
+                "load_seconds": entry.load_seconds,
+                "memory_bytes": entry.memory_bytes,
+                "load_count": entry.load_count,
+                "last_error": entry.last_error,
+            }
+            for entry in self._entries.values()
+        }
+
+    def _load(self, entry, mtime):
+        # Growth of the process RSS over the load, native allocations (TensorFlow,
+        # NumPy buffers) included. Approximate: other threads keep allocating, and
+        # memory freed by a replaced model is not subtracted.
+        with self._load_lock:
+            before = _rss_bytes()
+            start = time.perf_counter()
+            try:
+                model = entry.loader(entry.path)
+            except Exception as e:
+                entry.last_error = str(e)
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                after = _rss_bytes()
+
+        entry.model = model
+        entry.mtime = mtime
+        entry.loaded_at = time.time()
+        entry.load_seconds = elapsed
+        entry.memory_bytes = max(after - before, 0) if before is not None and after is not None else None
+        entry.load_count += 1
+        entry.last_error = None
+        print(f"Loaded model '{entry.name}' in {elapsed:.3f}s ({entry.memory_bytes} bytes)")
+
+
+# Served Keras classifiers, relative to MODELS_DIR; `python -m core.dense_model export`
+# writes their NumPy exports.
+KERAS_MODELS = {
+    "plank": "Planks/model_7_layers.h5",
+    "bicep_curls": "bicep_curls/bicep_curls_dnn.h5",
+    "lunges": "Lunges/lunges_dnn.h5",
+}
+
+registry = ModelRegistry()
+for model_name, model_path in KERAS_MODELS.items():
+    registry.register(model_name, model_path)
+registry.register("plank_scaler", "Planks/input_scaler.pkl", loader=load_pickle)
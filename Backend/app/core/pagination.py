@@ -0,0 +1,33 @@
+import base64
+import json
+
+
+def encode_cursor(*values) -> str:
+    """
+    Opaque cursor for keyset pagination: the sort key of the last row returned.
+
+    Args:
+        *values: The row's sort-key columns, JSON-serializable (dates as ISO strings).
+
+    Returns:
+        str: A URL-safe token to send back as ``cursor`` for the next page.
+    """
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list:
+    """
+    Inverse of ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor was not produced by ``encode_cursor``.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
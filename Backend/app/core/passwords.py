@@ -0,0 +1,78 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+# bcrypt cost factor: each +1 doubles the time of a hash or verify.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Threads doing bcrypt work; the bcrypt C code releases the GIL, so they run in parallel.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", min(4, os.cpu_count() or 1)))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification off the event loop.
+
+    Work goes to a dedicated thread pool so a burst of logins can't starve the
+    default executor, and at most ``workers`` operations are in flight; the rest
+    wait on a semaphore. The time spent waiting is recorded so a saturated pool
+    shows up in ``stats`` before it shows up as slow logins.
+    """
+
+    def __init__(self, context: CryptContext = pwd_context, workers: int = PASSWORD_WORKERS):
+        self.context = context
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = None
+        self.waiting = 0
+        self.operations = 0
+        self.total_queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    async def _run(self, fn, *args):
+        if self._slots is None:
+            # Created lazily so it binds to the running loop.
+            self._slots = asyncio.Semaphore(self.workers)
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        started_at = time.perf_counter()
+        try:
+            queued = started_at - queued_at
+            self.total_queue_seconds += queued
+            self.max_queue_seconds = max(self.max_queue_seconds, queued)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.operations += 1
+            self.total_run_seconds += time.perf_counter() - started_at
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(self.context.verify, password, hashed)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "waiting": self.waiting,
+            "operations": self.operations,
+            "mean_queue_ms": self.total_queue_seconds / self.operations * 1000 if self.operations else None,
+            "max_queue_ms": self.max_queue_seconds * 1000,
+            "mean_run_ms": self.total_run_seconds / self.operations * 1000 if self.operations else None,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,372 @@
+import asyncio
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from .frame_cache import FRAME_CACHE_SIZE, CacheMetrics, FrameResultCache, frame_hash
+from .landmarks import X, Y, VISIBILITY, pose_to_array
+from .preprocess import FramePreprocessor, to_frame
+
+POSE_WORKERS = int(os.getenv("POSE_WORKERS", os.cpu_count() or 1))
+# Frames allowed in flight across all workers before new work is rejected.
+POSE_QUEUE_SIZE = int(os.getenv("POSE_QUEUE_SIZE", 64 * POSE_WORKERS))
+# MediaPipe model: 0 lite, 1 full, 2 heavy. Per-exercise overrides as
+# "bench-press=2,cable-crossover=0".
+POSE_MODEL_COMPLEXITY = int(os.getenv("POSE_MODEL_COMPLEXITY", 1))
+POSE_MODEL_COMPLEXITY_OVERRIDES = {
+    exercise.strip(): int(value)
+    for exercise, _, value in (
+        item.partition("=") for item in os.getenv("POSE_MODEL_COMPLEXITY_OVERRIDES", "").split(",") if item.strip()
+    )
+}
+# Tracking sessions kept per worker process; the least recently used is closed beyond this.
+POSE_MAX_SESSIONS = int(os.getenv("POSE_MAX_SESSIONS", 32))
+# Crop tracked frames to the region around the previous landmarks.
+POSE_ROI_CROP = os.getenv("POSE_ROI_CROP", "false").lower() == "true"
+# Margin added around the landmarks' bounding box, as a fraction of its size.
+POSE_ROI_MARGIN = float(os.getenv("POSE_ROI_MARGIN", 0.5))
+# Landmarks at least this visible define the crop.
+POSE_ROI_MIN_VISIBILITY = float(os.getenv("POSE_ROI_MIN_VISIBILITY", 0.5))
+
+# Per-process MediaPipe state, created lazily inside each pool process:
+# one static-image Pose per model complexity for unrelated frames, and one
+# tracking Pose per session.
+_static_poses = {}
+_trackers = OrderedDict()
+_preprocessor = FramePreprocessor()
+_cache_metrics = CacheMetrics()
+
+
+class PoseQueueFull(Exception):
+    """Raised when the pose workers already have POSE_QUEUE_SIZE frames in flight."""
+
+
+def model_complexity(exercise: str | None) -> int:
+    """The MediaPipe ``model_complexity`` configured for an exercise slug."""
+    return POSE_MODEL_COMPLEXITY_OVERRIDES.get(exercise, POSE_MODEL_COMPLEXITY)
+
+
+def _static_pose(complexity: int):
+    pose = _static_poses.get(complexity)
+    if pose is None:
+        import mediapipe as mp
+        pose = _static_poses[complexity] = mp.solutions.pose.Pose(
+            static_image_mode=True, model_complexity=complexity,
+        )
+    return pose
+
+
+class _Tracker:
+    """
+    A video-mode Pose for one session, the region its frames are cropped to,
+    and optionally the previous frame's landmarks by frame hash for held positions.
+    """
+
+    def __init__(self, complexity: int, roi: bool, cache: bool):
+        import mediapipe as mp
+        self.pose = mp.solutions.pose.Pose(static_image_mode=False, model_complexity=complexity)
+        self.complexity = complexity
+        self.roi = roi
+        # Normalized (x0, y0, x1, y1), or None for the whole frame
+        self.crop = None
+        self.cache = FrameResultCache(max_size=1, metrics=_cache_metrics) if cache else None
+
+    def update_crop(self, landmarks):
+        """
+        Keep the current crop while the pose stays well inside it.
+
+        MediaPipe tracks in the coordinates of the image it is given, so the crop
+        only moves when the pose nears its edge (or is lost, which falls back to
+        the full frame) rather than following every small movement.
+        """
+        if landmarks is None:
+            self.crop = None
+            return
+        visible = landmarks[landmarks[:, VISIBILITY] >= POSE_ROI_MIN_VISIBILITY]
+        if not len(visible):
+            self.crop = None
+            return
+        x0, y0 = visible[:, X].min(), visible[:, Y].min()
+        x1, y1 = visible[:, X].max(), visible[:, Y].max()
+        if self.crop is not None:
+            cx0, cy0, cx1, cy1 = self.crop
+            inner_x, inner_y = (cx1 - cx0) * 0.1, (cy1 - cy0) * 0.1
+            if x0 >= cx0 + inner_x and y0 >= cy0 + inner_y and x1 <= cx1 - inner_x and y1 <= cy1 - inner_y:
+                return
+        margin_x, margin_y = (x1 - x0) * POSE_ROI_MARGIN, (y1 - y0) * POSE_ROI_MARGIN
+        crop = (
+            max(0.0, float(x0 - margin_x)), max(0.0, float(y0 - margin_y)),
+            min(1.0, float(x1 + margin_x)), min(1.0, float(y1 + margin_y)),
+        )
+        # Not worth it unless the crop is clearly smaller than the frame.
+        self.crop = crop if (crop[2] - crop[0]) * (crop[3] - crop[1]) < 0.8 else None
+
+    def process(self, image, decoded: bool):
+        if self.cache is None:
+            landmarks = _estimate(self.pose, image, decoded, self.crop)
+        else:
+            # Decoded once for both the hash and pose estimation; a frame that
+            # matches the last estimated one (within its crop) skips the model.
+            frame, is_rgb = (image, False) if decoded else _preprocessor.decode(image, self.crop)
+            key = frame_hash(frame, is_rgb, self.crop)
+            landmarks = self.cache.get(key)
+            if landmarks is not None:
+                return landmarks
+            landmarks = _estimate(self.pose, frame, True, self.crop, is_rgb)
+            if landmarks is not None:
+                self.cache.set(key, landmarks)
+        if self.roi:
+            self.update_crop(landmarks)
+        return landmarks
+
+    def close(self):
+        self.pose.close()
+
+
+def _tracker(session_id: str, complexity: int, roi: bool, cache: bool) -> _Tracker:
+    tracker = _trackers.get(session_id)
+    if tracker is None:
+        tracker = _trackers[session_id] = _Tracker(complexity, roi, cache)
+        while len(_trackers) > POSE_MAX_SESSIONS:
+            _, evicted = _trackers.popitem(last=False)
+            evicted.close()
+    _trackers.move_to_end(session_id)
+    return tracker
+
+
+def _init_worker():
+    _static_pose(POSE_MODEL_COMPLEXITY)
+
+
+def _estimate(pose, image, decoded: bool, crop: tuple | None = None, is_rgb: bool = False):
+    rgb, box = _preprocessor.prepare(image, decoded, crop, is_rgb)
+    output = pose.process(rgb)
+    if not output.pose_landmarks:
+        return None
+    landmarks = pose_to_array(output.pose_landmarks.landmark)
+    return to_frame(landmarks, box) if box is not None else landmarks
+
+
+def _detect_batch(images, decoded=False, complexity=POSE_MODEL_COMPLEXITY, session_id=None, roi=False, cache=False):
+    """
+    Run pose estimation inside a worker process.
+
+    Without a session every image is treated as unrelated and gets a full
+    detection. With one, the session's tracker is used: MediaPipe then only
+    re-detects when it loses the person, and otherwise tracks from the previous
+    frame's landmarks, which is several times cheaper.
+
+    Args:
+        images (list): Encoded JPEG/PNG images as bytes, or uint8 (H, W, 3)
+            BGR arrays if ``decoded``.
+        decoded (bool): Whether ``images`` are already decoded frames.
+        complexity (int): MediaPipe ``model_complexity``.
+        session_id (str | None): Track across calls under this id, in order.
+        roi (bool): Crop tracked frames around the previous landmarks.
+        cache (bool): Reuse the landmarks of the session's previous frame when
+            the frame is unchanged.
+
+    Returns:
+        list: A float32 (33, 4) array of x, y, z, visibility per frame,
+        or None where no pose was detected.
+    """
+    tracker = _tracker(session_id, complexity, roi, cache) if session_id is not None else None
+    pose = _static_pose(complexity) if tracker is None else None
+    return [
+        tracker.process(image, decoded) if tracker is not None else _estimate(pose, image, decoded)
+        for image in images
+    ]
+
+
+def _close_session(session_id):
+    tracker = _trackers.pop(session_id, None)
+    if tracker is not None:
+        tracker.close()
+
+
+def _cache_stats():
+    return _cache_metrics.stats()
+
+
+class PoseWorkerPool:
+    """
+    A pool of processes that each own MediaPipe ``Pose`` instances.
+
+    Every worker is its own single-process executor so work can be steered to a
+    specific process. Unrelated frames go to the worker with the fewest frames in
+    flight; a tracking session (a websocket stream, a video) is pinned to one
+    worker so its frames reach the same tracker in order. Once ``queue_size``
+    frames are pending, ``detect`` raises ``PoseQueueFull`` instead of queueing
+    more, so callers can shed load rather than pile up latency. A worker process
+    that dies (a MediaPipe crash, the OOM killer) is replaced; the sessions
+    pinned to it start over with fresh trackers in the new process.
+    """
+
+    def __init__(self, workers: int = POSE_WORKERS, queue_size: int = POSE_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executors = []
+        self._in_flight = []
+        self._sessions = {}
+        self._session_counts = [0] * workers
+        self.rejected = 0
+        self.restarts = 0
+
+    @staticmethod
+    def _new_executor():
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_worker)
+
+    def start(self):
+        if self._executors:
+            return
+        self._executors = [self._new_executor() for _ in range(self.workers)]
+        self._in_flight = [0] * self.workers
+
+    def _restart_worker(self, worker: int, executor):
+        # Several failed calls can report the same crash; replace the process once.
+        if self._executors[worker] is not executor:
+            return
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._executors[worker] = self._new_executor()
+        self.restarts += 1
+        print(f"Pose worker {worker} died; started a replacement")
+
+    def shutdown(self):
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors = []
+        self._sessions.clear()
+        self._session_counts = [0] * self.workers
+
+    @property
+    def pending(self) -> int:
+        return sum(self._in_flight)
+
+    def _submit(self, items: list, worker: int | None = None, **kwargs) -> asyncio.Future:
+        # Admission and submission happen synchronously, so calls reach a
+        # worker in the order they are made.
+        self.start()
+        if self.pending + len(items) > self.queue_size:
+            self.rejected += len(items)
+            raise PoseQueueFull(f"Pose workers are saturated ({self.pending} frames pending)")
+
+        if worker is None:
+            worker = min(range(self.workers), key=self._in_flight.__getitem__)
+        loop = asyncio.get_running_loop()
+        call = partial(_detect_batch, items, **kwargs)
+        executor = self._executors[worker]
+        try:
+            future = loop.run_in_executor(executor, call)
+        except BrokenProcessPool:
+            self._restart_worker(worker, executor)
+            executor = self._executors[worker]
+            future = loop.run_in_executor(executor, call)
+        # Counted only once submitted, so a failed submit cannot leak in-flight frames.
+        self._in_flight[worker] += len(items)
+
+        def release(done):
+            self._in_flight[worker] -= len(items)
+            if not done.cancelled() and isinstance(done.exception(), BrokenProcessPool):
+                self._restart_worker(worker, executor)
+
+        future.add_done_callback(release)
+        return future
+
+    def open_session(
+        self,
+        session_id: str,
+        exercise: str | None = None,
+        roi: bool = POSE_ROI_CROP,
+        cache: bool = FRAME_CACHE_SIZE > 0,
+    ):
+        """
+        Start a tracking session on the worker with the fewest sessions.
+
+        Args:
+            session_id (str): Unique id for the stream.
+            exercise (str | None): Exercise slug, selecting the model complexity.
+            roi (bool): Crop frames around the previous frame's landmarks.
+            cache (bool): Return the previous frame's landmarks for a frame
+                whose hash matches it. Off unless ``FRAME_CACHE_SIZE`` is set.
+        """
+        self.start()
+        worker = min(range(self.workers), key=lambda w: (self._session_counts[w], self._in_flight[w]))
+        self._session_counts[worker] += 1
+        self._sessions[session_id] = (worker, {
+            "complexity": model_complexity(exercise), "session_id": session_id, "roi": roi, "cache": cache,
+        })
+
+    async def close_session(self, session_id: str):
+        """Drop a session's tracker in its worker; unknown ids are ignored."""
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return
+        worker = session[0]
+        self._session_counts[worker] -= 1
+        if self._executors:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(self._executors[worker], _close_session, session_id)
+            except BrokenProcessPool:
+                # The tracker died with its process.
+                pass
+
+    def submit(self, images: list, exercise: str | None = None, session_id: str | None = None, decoded: bool = False) -> asyncio.Future:
+        """
+        Queue a batch and return a future of its landmarks without waiting.
+
+        Raises ``PoseQueueFull`` immediately if the workers are saturated.
+        Batches of one session are processed in the order they are submitted.
+
+        Args:
+            images (list): Encoded JPEG/PNG images, or BGR frames if ``decoded``.
+            exercise (str | None): Exercise slug, selecting the model complexity
+                for frames outside a session.
+            session_id (str | None): An id from ``open_session`` to track with.
+            decoded (bool): Whether ``images`` are already decoded frames.
+        """
+        if session_id is not None:
+            worker, options = self._sessions[session_id]
+            return self._submit(images, worker, decoded=decoded, **options)
+        return self._submit(images, decoded=decoded, complexity=model_complexity(exercise))
+
+    def submit_frames(self, frames: list, exercise: str | None = None, session_id: str | None = None) -> asyncio.Future:
+        """``submit`` for decoded BGR frames."""
+        return self.submit(frames, exercise, session_id, decoded=True)
+
+    async def detect(self, buffers: list, exercise: str | None = None, session_id: str | None = None) -> list:
+        """Landmarks for each encoded JPEG/PNG image, or None where no pose was found."""
+        return await self.submit(buffers, exercise, session_id)
+
+    async def detect_frames(self, frames: list, exercise: str | None = None, session_id: str | None = None) -> list:
+        """Landmarks for each decoded BGR frame, or None where no pose was found."""
+        return await self.submit_frames(frames, exercise, session_id)
+
+    async def cache_stats(self) -> dict:
+        """Frame cache hits and misses summed over the worker processes."""
+        totals = CacheMetrics()
+        if self._executors:
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(
+                *(loop.run_in_executor(e, _cache_stats) for e in self._executors), return_exceptions=True
+            )
+            for stats in results:
+                if isinstance(stats, BaseException):
+                    continue
+                totals.hits += stats["hits"]
+                totals.misses += stats["misses"]
+        return totals.stats()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "pending": self.pending,
+            "in_flight": list(self._in_flight),
+            "sessions": list(self._session_counts),
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
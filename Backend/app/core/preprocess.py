@@ -0,0 +1,170 @@
+import os
+import numpy as np
+from .landmarks import X, Y, Z
+
+# Longest side of the image handed to pose estimation. MediaPipe runs its
+# detector at 224 px and its landmark model at 256 px around the person, so
+# larger inputs cost decode and resize time without improving landmarks.
+POSE_MAX_SIDE = int(os.getenv("POSE_MAX_SIDE", 640))
+
+# JPEG start-of-frame markers carry the image size (DHT, JPG and DAC share the range).
+_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Standalone markers without a length field
+_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+_REDUCED_FACTORS = (8, 4, 2)
+# Preallocated output buffers kept per worker, one per distinct shape
+_MAX_BUFFERS = 4
+
+
+def jpeg_size(data: bytes) -> tuple[int, int] | None:
+    """
+    Read ``(height, width)`` from a JPEG header without decoding it.
+
+    Args:
+        data (bytes): An encoded image.
+
+    Returns:
+        tuple | None: The size, or None if ``data`` is not a readable JPEG.
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+    i, end = 2, len(data)
+    while i + 4 <= end:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in _STANDALONE_MARKERS:
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            if i + 9 > end:
+                return None
+            return int.from_bytes(data[i + 5:i + 7], "big"), int.from_bytes(data[i + 7:i + 9], "big")
+        i += 2 + int.from_bytes(data[i + 2:i + 4], "big")
+    return None
+
+
+def to_frame(landmarks: np.ndarray, box: tuple) -> np.ndarray:
+    """
+    Map landmarks normalized to a crop back to the normalized coordinates of the whole frame.
+
+    Args:
+        landmarks (np.ndarray): A (33, 4) array, modified in place.
+        box (tuple): ``(x0, y0, x1, y1, width, height)`` of the crop in pixels
+            of a frame of ``width`` x ``height``, as returned by ``prepare``.
+    """
+    x0, y0, x1, y1, width, height = box
+    landmarks[:, X] = (x0 + landmarks[:, X] * (x1 - x0)) / width
+    landmarks[:, Y] = (y0 + landmarks[:, Y] * (y1 - y0)) / height
+    # MediaPipe scales z like x
+    landmarks[:, Z] *= (x1 - x0) / width
+    return landmarks
+
+
+class FramePreprocessor:
+    """
+    Turns encoded images or BGR frames into the RGB input of pose estimation.
+
+    JPEGs are decoded at 1/2, 1/4 or 1/8 scale when that still leaves at least
+    ``max_side`` pixels, picked from the header before decoding, and straight
+    to RGB where OpenCV supports it. An optional crop is cut next, and the
+    result is downscaled to ``max_side`` into a reused buffer; a BGR source is
+    converted in place in that buffer, so the colour pass only touches the
+    small image. Landmarks are normalized to the returned image; ``to_frame``
+    maps them back to the whole frame.
+
+    Not thread-safe: each worker process owns one.
+    """
+
+    def __init__(self, max_side: int = POSE_MAX_SIDE):
+        self.max_side = max_side
+        self._buffers = {}
+
+    def _buffer(self, shape: tuple) -> np.ndarray:
+        buffer = self._buffers.get(shape)
+        if buffer is None:
+            if len(self._buffers) >= _MAX_BUFFERS:
+                self._buffers.clear()
+            buffer = self._buffers[shape] = np.empty(shape, np.uint8)
+        return buffer
+
+    def decode(self, data: bytes, crop: tuple | None = None) -> tuple[np.ndarray, bool]:
+        """
+        Decode an encoded image, at reduced scale when the target size allows.
+
+        Args:
+            data (bytes): Encoded JPEG/PNG image.
+            crop (tuple | None): Normalized ``(x0, y0, x1, y1)`` region that will
+                be kept, so the scale is chosen for the region, not the frame.
+
+        Returns:
+            tuple: The image and whether it is RGB (otherwise BGR).
+        """
+        import cv2
+
+        rgb_flag = getattr(cv2, "IMREAD_COLOR_RGB", None)
+        flags = cv2.IMREAD_COLOR
+        size = jpeg_size(data)
+        if size is not None:
+            region = max(size) * (max(crop[2] - crop[0], crop[3] - crop[1]) if crop else 1.0)
+            factor = next((f for f in _REDUCED_FACTORS if region / f >= self.max_side), 1)
+            if factor > 1:
+                flags = getattr(cv2, f"IMREAD_REDUCED_COLOR_{factor}")
+        if rgb_flag is not None:
+            flags = (flags & ~cv2.IMREAD_COLOR) | rgb_flag
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+        if image is None:
+            raise ValueError("Could not decode image data")
+        return image, rgb_flag is not None
+
+    def prepare(
+        self, image, decoded: bool = False, crop: tuple | None = None, is_rgb: bool = False
+    ) -> tuple[np.ndarray, tuple | None]:
+        """
+        Produce the RGB array to run pose estimation on.
+
+        Args:
+            image: Encoded JPEG/PNG bytes, or a uint8 (H, W, 3) frame if ``decoded``.
+            decoded (bool): Whether ``image`` is already decoded, e.g. by ``decode``.
+            crop (tuple | None): Normalized ``(x0, y0, x1, y1)`` region to keep.
+            is_rgb (bool): Whether a decoded ``image`` is RGB rather than BGR.
+
+        Returns:
+            tuple: The RGB array, valid until the next call, and the crop box
+            for ``to_frame`` (None when the whole frame was used).
+        """
+        import cv2
+
+        if decoded:
+            frame = image
+        else:
+            frame, is_rgb = self.decode(image, crop)
+        height, width = frame.shape[:2]
+
+        box = None
+        if crop is not None:
+            x0, y0 = int(crop[0] * width), int(crop[1] * height)
+            x1, y1 = max(x0 + 1, int(np.ceil(crop[2] * width))), max(y0 + 1, int(np.ceil(crop[3] * height)))
+            frame = frame[y0:y1, x0:x1]
+            box = (x0, y0, x1, y1, width, height)
+
+        crop_height, crop_width = frame.shape[:2]
+        scale = self.max_side / max(crop_height, crop_width)
+        if scale < 1:
+            size = (max(1, round(crop_width * scale)), max(1, round(crop_height * scale)))
+            output = self._buffer((size[1], size[0], 3))
+            cv2.resize(frame, size, dst=output, interpolation=cv2.INTER_AREA)
+            if not is_rgb:
+                cv2.cvtColor(output, cv2.COLOR_BGR2RGB, dst=output)
+        elif not is_rgb:
+            output = self._buffer(frame.shape)
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=output)
+        elif box is not None:
+            output = self._buffer(frame.shape)
+            np.copyto(output, frame)
+        else:
+            output = frame
+        return output, box
@@ -0,0 +1,88 @@
+NON_MISTAKE_KEYS = {"breakpoint", "initial_position", "correct", "error", "session_id"}
+
+
+def exercise_key(exercise: str) -> str:
+    """
+    The name a streamed exercise's sets are stored under in user_exercise_data.
+
+    URL slugs use hyphens (``lateral-raises``) while the classifier routes use
+    underscores (``bicep_curls``); both save paths store the underscored form so
+    an exercise never splits across two records and rollups.
+    """
+    return exercise.replace("-", "_")
+
+
+class RepCounter:
+    """
+    Incremental rep and mistake tracker for one set of one exercise.
+
+    Feed it the per-frame flag dict produced by the analyzers/classifiers.
+    A rep is counted when the lifter returns to ``initial_position`` after having
+    reached ``breakpoint`` since the last time they were in the initial position.
+    Every other flag is treated as a mistake and tracked as the share of frames it
+    was raised on. Each ``update`` is O(number of flags), independent of set length.
+
+    Classifiers that emit no phase flags cannot count reps; their summary reports
+    ``rep_count`` as None so a stored count is not overwritten with 0.
+
+    The score matches the report page: 100 minus the average percentage of the
+    mistakes that occurred, clamped to [0, 100].
+    """
+
+    def __init__(self, exercise: str, count_reps: bool = True):
+        self.exercise = exercise
+        self.count_reps = count_reps
+        self.frames = 0
+        self.rep_count = 0
+        # Whether any frame carried the phase flags reps are counted from
+        self.phased = False
+        self.phase = "waiting"
+        self.mistake_frames = {}
+
+    def update(self, flags: dict) -> int:
+        """Consume one frame's flags and return the current rep count."""
+        if "error" in flags:
+            return self.rep_count
+        self.frames += 1
+
+        if "initial_position" in flags or "breakpoint" in flags:
+            self.phased = True
+        if self.count_reps:
+            if flags.get("initial_position") == 1:
+                if self.phase == "moving":
+                    self.rep_count += 1
+                self.phase = "ready"
+            elif flags.get("breakpoint") == 1 and self.phase == "ready":
+                self.phase = "moving"
+
+        for key, value in flags.items():
+            if key in NON_MISTAKE_KEYS:
+                continue
+            if value == 1:
+                self.mistake_frames[key] = self.mistake_frames.get(key, 0) + 1
+        return self.rep_count
+
+    def mistake_percentages(self) -> dict:
+        if not self.frames:
+            return {}
+        return {key: count / self.frames * 100 for key, count in self.mistake_frames.items()}
+
+    def score(self) -> float:
+        percentages = self.mistake_percentages()
+        if not percentages:
+            return 100.0
+        average = sum(percentages.values()) / len(percentages)
+        return max(0.0, min(100.0, 100.0 - average))
+
+    def summary(self) -> dict:
+        """
+        The aggregate in the shape of ``ExerciseDataUpdate``, plus the frame count.
+
+        ``rep_count`` is None when reps were not counted for this set.
+        """
+        return {
+            "rep_count": self.rep_count if self.count_reps and self.phased else None,
+            "mistake_percentages": self.mistake_percentages(),
+            "score": self.score(),
+            "frames": self.frames,
+        }
@@ -0,0 +1,152 @@
+import numpy as np
+from .geometry import joint_angles, joint_distances, joint_index
+
+# Features: the measurements a rule can test.
+
+class Angle:
+    """Angle in degrees at ``b`` between the segments b->a and b->c."""
+    def __init__(self, a, b, c):
+        self.joints = (a, b, c)
+
+class Distance:
+    """3D distance between two landmarks."""
+    def __init__(self, a, b):
+        self.joints = (a, b)
+
+class Slope:
+    """Image-plane slope (dy / dx) of the line from ``b`` to ``a``."""
+    def __init__(self, a, b):
+        self.joints = (a, b)
+
+# Conditions: comparisons against a constant or a scaled feature, and combinators.
+
+class Below:
+    def __init__(self, feature: str, threshold, scale: float = 1.0):
+        self.feature, self.threshold, self.scale = feature, threshold, scale
+
+class Above(Below):
+    pass
+
+class All:
+    def __init__(self, *conditions):
+        self.conditions = conditions
+
+class Any(All):
+    pass
+
+class Flag:
+    """Reuse another flag of the same exercise as a condition."""
+    def __init__(self, name: str):
+        self.name = name
+
+
+class ExerciseRules:
+    """
+    One exercise's form checks, declared as data and compiled for NumPy.
+
+    ``features`` maps names to ``Angle``/``Distance``/``Slope`` measurements and
+    ``flags`` maps each output flag to a condition tree over those names, in the
+    order the flags are reported. At construction every measurement is folded
+    into one index array per kind and every comparison into one set of column
+    arrays, so ``evaluate`` is a fixed handful of vectorized ops whatever the
+    number of rules, for a single frame or a whole batch.
+    """
+
+    def __init__(self, features: dict, flags: dict):
+        kinds = {Angle: [], Distance: [], Slope: []}
+        for name, feature in features.items():
+            kinds[type(feature)].append(name)
+        order = kinds[Angle] + kinds[Distance] + kinds[Slope]
+        self._columns = {name: i for i, name in enumerate(order)}
+        self._angles = joint_index([features[n].joints for n in kinds[Angle]]).reshape(-1, 3)
+        self._distances = joint_index([features[n].joints for n in kinds[Distance]]).reshape(-1, 2)
+        self._slopes = joint_index([features[n].joints for n in kinds[Slope]]).reshape(-1, 2)
+
+        self._atoms = []
+        self._atom_ids = {}
+        self.flag_names = list(flags)
+        self._conditions = flags
+        self._nodes = {}
+        for name in flags:
+            self._compile_flag(name)
+
+        lhs, rhs, constant, scale, above = [], [], [], [], []
+        for atom in self._atoms:
+            lhs.append(self._columns[atom.feature])
+            by_feature = isinstance(atom.threshold, str)
+            rhs.append(self._columns[atom.threshold] if by_feature else -1)
+            constant.append(np.nan if by_feature else atom.threshold)
+            scale.append(atom.scale)
+            above.append(isinstance(atom, Above))
+        self._lhs = np.array(lhs, dtype=np.intp)
+        self._rhs = np.array(rhs, dtype=np.intp)
+        self._rhs_is_feature = self._rhs >= 0
+        self._rhs_safe = np.where(self._rhs_is_feature, self._rhs, 0)
+        self._constant = np.array(constant, dtype=np.float64)
+        self._scale = np.array(scale, dtype=np.float64)
+        self._above = np.array(above, dtype=bool)
+
+    def _compile_flag(self, name):
+        if name not in self._nodes:
+            self._nodes[name] = self._compile(self._conditions[name])
+        return self._nodes[name]
+
+    def _compile(self, condition):
+        if isinstance(condition, Flag):
+            return self._compile_flag(condition.name)
+        if isinstance(condition, Below):
+            key = (type(condition), condition.feature, condition.threshold, condition.scale)
+            if key not in self._atom_ids:
+                self._atom_ids[key] = len(self._atoms)
+                self._atoms.append(condition)
+            return ("atom", self._atom_ids[key])
+        children = [self._compile(c) for c in condition.conditions]
+        combine = "any" if isinstance(condition, Any) else "all"
+        if all(kind == "atom" for kind, _ in children):
+            return (combine + "_atoms", np.array([i for _, i in children], dtype=np.intp))
+        return (combine, children)
+
+    def _evaluate_node(self, node, atoms):
+        kind, payload = node
+        if kind == "atom":
+            return atoms[..., payload]
+        if kind == "all_atoms":
+            return atoms[..., payload].all(axis=-1)
+        if kind == "any_atoms":
+            return atoms[..., payload].any(axis=-1)
+        stacked = np.stack([self._evaluate_node(child, atoms) for child in payload], axis=-1)
+        return stacked.any(axis=-1) if kind == "any" else stacked.all(axis=-1)
+
+    def measure(self, landmarks: np.ndarray) -> np.ndarray:
+        """All declared features, (N,) for one frame or (F, N) for a batch."""
+        columns = []
+        if len(self._angles):
+            columns.append(joint_angles(landmarks, self._angles))
+        if len(self._distances):
+            columns.append(joint_distances(landmarks, self._distances))
+        if len(self._slopes):
+            delta = landmarks[..., self._slopes[:, 0], :2] - landmarks[..., self._slopes[:, 1], :2]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                columns.append(delta[..., 1] / delta[..., 0])
+        return np.concatenate(columns, axis=-1)
+
+    def evaluate(self, landmarks: np.ndarray) -> np.ndarray:
+        """
+        Evaluate every flag.
+
+        Args:
+            landmarks (np.ndarray): (33, D) for one frame or (F, 33, D) for a batch.
+
+        Returns:
+            np.ndarray: int8 flags in ``flag_names`` order, (K,) or (F, K).
+        """
+        values = self.measure(landmarks)
+        lhs = values[..., self._lhs]
+        rhs = np.where(self._rhs_is_feature, values[..., self._rhs_safe] * self._scale, self._constant)
+        atoms = np.where(self._above, lhs > rhs, lhs < rhs)
+        flags = [self._evaluate_node(self._nodes[name], atoms) for name in self.flag_names]
+        return np.stack(flags, axis=-1).astype(np.int8)
+
+    def evaluate_frame(self, landmarks: np.ndarray) -> dict:
+        """Flags for one frame as the ``{name: 0 or 1}`` dict the endpoints return."""
+        return dict(zip(self.flag_names, self.evaluate(landmarks).tolist()))
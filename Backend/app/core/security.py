@@ -3,45 +3,76 @@ from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from models.user import User
 from database import get_db
+from core.cache import make_cache
+from core.passwords import password_hasher
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from jose import jwt, JWTError
 from dotenv import load_dotenv
 from typing import Optional
 
 load_dotenv()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth_2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret-key") 
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", 10000))
 
-async def get_current_user(token: str = Depends(oauth_2_scheme), db: AsyncSession = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+# Authenticated users by id, so protected requests skip the users lookup.
+# Entries hold the columns authorization needs (never the password hash) and are
+# dropped by CRUD.users when a user is updated or deleted.
+user_cache = make_cache("auth_user", max_size=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+CACHED_USER_FIELDS = ("id", "username", "email", "role")
+
+async def invalidate_cached_user(user_id: int):
+    """Drop a user from the auth cache after it changes."""
+    await user_cache.delete(user_id)
+
+async def get_user_from_token(token: str, db: AsyncSession) -> Optional[User]:
+    """
+    Resolve the user a bearer token was issued to.
+
+    Args:
+        token (str): The encoded JWT.
+        db (AsyncSession): Session used to load the user.
+
+    Returns:
+        Optional[User]: The user, or None if the token is invalid or the user no longer exists.
+    """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: int = int(payload.get("sub"))
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
+    except (JWTError, TypeError, ValueError):
+        return None
+
+    cached = await user_cache.get(user_id)
+    if cached is not None:
+        # Detached stand-in: enough for authorization, not meant to be added to a session.
+        return User(**cached)
 
     from CRUD import users
     user = await users.get_user(db, user_id)
+    if user is not None:
+        await user_cache.set(user_id, {field: getattr(user, field) for field in CACHED_USER_FIELDS})
+    return user
+
+async def get_current_user(token: str = Depends(oauth_2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    user = await get_user_from_token(token, db)
     if user is None:
         raise credentials_exception
     return user
 
-def hash_password(password: str) -> str:
+async def hash_password(password: str) -> str:
     """
-    Hash a plain-text password using bcrypt.
+    Hash a plain-text password using bcrypt, on the password pool so the event loop stays free.
 
     Args:
         password (str): The plain-text password to hash.
@@ -49,11 +80,11 @@ def hash_password(password: str) -> str:
     Returns:
         str: The hashed password.
     """
-    return pwd_context.hash(password)
+    return await password_hasher.hash(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
-    Verify if a plain-text password matches its hashed version.
+    Verify if a plain-text password matches its hashed version, on the password pool.
 
     Args:
         plain_password (str): The plain-text password to verify.
@@ -62,7 +93,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Returns:
         bool: True if passwords match, False otherwise.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return await password_hasher.verify(plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from starlette import status
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+logger = logging.getLogger("streaming")
+
+
+class StreamSession:
+    """
+    Server-side state for one streaming websocket connection.
+
+    ``state`` is free for the endpoint's handler to keep whatever it needs
+    between frames (trackers, counters, caches).
+    """
+
+    def __init__(self, websocket: WebSocket, exercise: str, user_id: int | None = None):
+        self.websocket = websocket
+        self.exercise = exercise
+        self.user_id = user_id
+        self.state = {}
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.started_at = time.time()
+
+
+async def run_stream(session: StreamSession, handle_message):
+    """
+    Pump frames from a websocket through ``handle_message`` until the client leaves.
+
+    Binary messages are passed through as ``bytes``; text messages are parsed as
+    JSON. A JSON object with an ``"action"`` key is a control message (for example
+    ``{"action": "finish"}``) and is always delivered. For frames, only the most
+    recent unprocessed one is kept: if the client sends faster than frames are
+    analyzed, older pending frames are dropped so feedback describes what the
+    user is doing now instead of lagging further behind.
+
+    A text message that is not valid JSON gets an ``{"error": "Invalid JSON"}``
+    reply and the connection stays open. An unexpected failure of the stream
+    itself is logged and the socket is closed with code 1011.
+
+    Args:
+        session (StreamSession): The accepted connection and its state.
+        handle_message: ``async (session, message) -> dict``. The returned dict is
+            sent back with ``seq`` and ``dropped`` fields added.
+    """
+    pending = deque()
+    ready = asyncio.Event()
+
+    async def receive():
+        while True:
+            message = await session.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            session.received += 1
+            data = message.get("bytes")
+            if data is None:
+                try:
+                    data = json.loads(message.get("text") or "null")
+                except ValueError:
+                    # Answered, never dropped, like a control message
+                    pending.append((session.received, None, False, "Invalid JSON"))
+                    ready.set()
+                    continue
+            is_frame = not (isinstance(data, dict) and "action" in data)
+            if is_frame and pending and pending[-1][2]:
+                pending.pop()
+                session.dropped += 1
+            pending.append((session.received, data, is_frame, None))
+            ready.set()
+
+    async def process():
+        while True:
+            await ready.wait()
+            ready.clear()
+            while pending:
+                seq, data, _, error = pending.popleft()
+                if error is not None:
+                    result = {"error": error}
+                else:
+                    try:
+                        result = await handle_message(session, data)
+                    except Exception as e:
+                        result = {"error": str(e)}
+                session.processed += 1
+                await session.websocket.send_json({**result, "seq": seq, "dropped": session.dropped})
+
+    receiver = asyncio.create_task(receive())
+    processor = asyncio.create_task(process())
+    try:
+        done, _ = await asyncio.wait({receiver, processor}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is None or isinstance(error, WebSocketDisconnect):
+                continue
+            logger.error(
+                "Stream for user %s (%s) failed", session.user_id, session.exercise,
+                exc_info=(type(error), error, error.__traceback__),
+            )
+            try:
+                await session.websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+            except Exception:
+                # The connection is already gone.
+                pass
+            break
+    finally:
+        for task in (receiver, processor):
+            task.cancel()
+        await asyncio.gather(receiver, processor, return_exceptions=True)
@@ -0,0 +1,330 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from functools import partial
+import numpy as np
+from .exercise_rules import EXERCISE_RULES
+from .pose_workers import PoseQueueFull, PoseWorkerPool
+from .preprocess import POSE_MAX_SIDE
+from .rep_counter import RepCounter
+
+# Frames are downscaled so their longest side is at most this before they are
+# sent to the pose workers, which would otherwise shrink them to POSE_MAX_SIDE
+# after paying for the IPC.
+VIDEO_MAX_SIDE = int(os.getenv("VIDEO_MAX_SIDE", POSE_MAX_SIDE))
+# Frames per pose worker call
+VIDEO_BATCH_SIZE = int(os.getenv("VIDEO_BATCH_SIZE", 8))
+# Batches in flight per video segment: enough to overlap decoding with pose
+# estimation, while live streams on the same worker wait behind at most this many.
+VIDEO_WINDOW = int(os.getenv("VIDEO_WINDOW", 2))
+# Analyzed frames per segment below which a video is split into fewer segments,
+# since every segment starts its tracker with a full detection
+VIDEO_MIN_SEGMENT_FRAMES = int(os.getenv("VIDEO_MIN_SEGMENT_FRAMES", 64))
+# Seconds a batch may wait for room on saturated pose workers before the video fails
+VIDEO_SUBMIT_TIMEOUT = float(os.getenv("VIDEO_SUBMIT_TIMEOUT", 30))
+
+
+def iter_video_frames(
+    path: str,
+    every_nth: int = 1,
+    max_frames: int | None = None,
+    max_side: int = VIDEO_MAX_SIDE,
+    start: int = 0,
+    stop: int | None = None,
+):
+    """
+    Decode a video file one frame at a time.
+
+    Skipped frames are only grabbed, not decoded, so subsampling saves the
+    decode cost too. Only the current frame is ever held in memory.
+
+    Args:
+        path (str): Path of any video OpenCV can open.
+        every_nth (int): Keep one frame out of this many, counted from frame 0.
+        max_frames (int | None): Stop after this many kept frames.
+        max_side (int): Downscale kept frames so their longest side is at most this.
+        start (int): Index of the first frame to read; the capture seeks to it.
+        stop (int | None): Index of the frame to stop before, or None for the end.
+
+    Yields:
+        tuple: ``(frame_index, time_ms, frame)`` with ``frame`` a BGR uint8 array.
+    """
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("Could not open video")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    if start:
+        capture = _seek(capture, path, start)
+    try:
+        index = start - 1
+        kept = 0
+        while max_frames is None or kept < max_frames:
+            index += 1
+            if stop is not None and index >= stop:
+                break
+            if not capture.grab():
+                break
+            if index % every_nth:
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                break
+            height, width = frame.shape[:2]
+            scale = max_side / max(height, width)
+            if scale < 1:
+                frame = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+            time_ms = index / fps * 1000 if fps else capture.get(cv2.CAP_PROP_POS_MSEC)
+            kept += 1
+            yield index, time_ms, frame
+    finally:
+        capture.release()
+
+
+def _seek(capture, path: str, start: int):
+    """
+    Position ``capture`` so the next ``grab`` returns frame ``start``.
+
+    Seeks land on a keyframe with many codecs, so the position is read back
+    and the remaining frames are grabbed up to ``start``. If the seek went past
+    it, or the position can't be read, the video is reopened and grabbed from
+    the first frame, which is slower but exact.
+    """
+    import cv2
+
+    capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+    position = int(capture.get(cv2.CAP_PROP_POS_FRAMES))
+    if not 0 <= position <= start:
+        capture.release()
+        capture = cv2.VideoCapture(path)
+        position = 0
+    for _ in range(start - position):
+        if not capture.grab():
+            break
+    return capture
+
+
+def video_info(path: str) -> dict:
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    try:
+        return {
+            "fps": capture.get(cv2.CAP_PROP_FPS) or None,
+            "frame_count": int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or None,
+            "width": int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        capture.release()
+
+
+async def _submit_with_backoff(submit, frames, timeout: float):
+    # Video work yields to live traffic: wait for room instead of failing at
+    # once, but give up if the workers stay saturated for ``timeout`` seconds.
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return submit(frames)
+        except PoseQueueFull:
+            if time.monotonic() >= deadline:
+                raise PoseQueueFull(f"Pose workers stayed busy for {timeout:g}s; try again later")
+            await asyncio.sleep(0.05)
+
+
+async def _analyze_segment(
+    path: str,
+    rules,
+    submit,
+    start: int,
+    stop: int | None,
+    every_nth: int,
+    max_frames: int | None,
+    batch_size: int,
+    window: int,
+    submit_timeout: float,
+) -> list:
+    """
+    Pose estimation and rule flags for the frames of one contiguous segment.
+
+    Frames are decoded in a thread, batched and handed to ``submit`` with up to
+    ``window`` batches in flight, so the worker stays busy while decoding
+    continues. Batches are submitted and consumed in frame order, which keeps
+    the segment's tracking session in order.
+
+    Returns:
+        list: ``(frame_index, time_ms, flags)`` per analyzed frame, with
+        ``flags`` None where no pose was detected.
+    """
+    loop = asyncio.get_running_loop()
+    frames = iter_video_frames(path, every_nth, max_frames, start=start, stop=stop)
+    results = []
+
+    def next_batch():
+        return [item for _, item in zip(range(batch_size), frames)]
+
+    def consume(meta, landmarks):
+        found = [i for i, lm in enumerate(landmarks) if lm is not None]
+        flags = rules.evaluate(np.stack([landmarks[i] for i in found])) if found else None
+        row_of = {i: row for row, i in enumerate(found)}
+        for i, (index, time_ms) in enumerate(meta):
+            result = dict(zip(rules.flag_names, flags[row_of[i]].tolist())) if i in row_of else None
+            results.append((index, time_ms, result))
+
+    pending = deque()
+    try:
+        while True:
+            batch = await loop.run_in_executor(None, next_batch)
+            if batch:
+                meta = [(index, time_ms) for index, time_ms, _ in batch]
+                future = await _submit_with_backoff(submit, [frame for _, _, frame in batch], submit_timeout)
+                pending.append((meta, future))
+            if pending and (len(pending) >= window or not batch):
+                meta, future = pending.popleft()
+                consume(meta, await future)
+            if not batch and not pending:
+                break
+    finally:
+        for _, future in pending:
+            future.cancel()
+        frames.close()
+    return results
+
+
+def _segment_bounds(frame_count: int | None, every_nth: int, max_frames: int | None, segments: int) -> list:
+    # Contiguous (start, stop, max_frames) ranges of roughly equal kept-frame counts.
+    if not frame_count:
+        return [(0, None, max_frames)]
+    end = frame_count if max_frames is None else min(frame_count, max_frames * every_nth)
+    kept = -(-end // every_nth)
+    segments = max(1, min(segments, kept // max(1, VIDEO_MIN_SEGMENT_FRAMES)))
+    starts = [kept * i // segments * every_nth for i in range(segments)]
+    bounds = [(begin, following, None) for begin, following in zip(starts, starts[1:])]
+    # The frame count is only an estimate for some containers: the last segment
+    # reads to the real end unless a frame limit applies.
+    bounds.append((starts[-1], end if max_frames is not None else None, None))
+    return bounds
+
+
+async def analyze_video(
+    path: str,
+    exercise: str,
+    pool: PoseWorkerPool,
+    every_nth: int = 1,
+    max_frames: int | None = None,
+    batch_size: int = VIDEO_BATCH_SIZE,
+    window: int = VIDEO_WINDOW,
+    submit_timeout: float = VIDEO_SUBMIT_TIMEOUT,
+    segments: int | None = None,
+) -> dict:
+    """
+    Run pose estimation and the exercise rules over a whole video.
+
+    The video is split into contiguous segments, one per pose worker, and each
+    segment is decoded and tracked under its own session, so every worker
+    process takes part and a long video never queues more than ``window``
+    batches behind the live streams pinned to any one worker. Each segment's
+    tracker starts with a full detection. The segments' results are stitched
+    back in frame order before reps are counted. Memory is bounded by the
+    windows, not the video length, apart from the returned timeline.
+
+    Args:
+        path (str): Path of the video file.
+        exercise (str): A key of ``EXERCISE_RULES``.
+        pool (PoseWorkerPool): The pose workers to run on.
+        every_nth (int): Analyze one frame out of this many.
+        max_frames (int | None): Stop after this many analyzed frames.
+        batch_size (int): Frames per pose worker call.
+        window (int): Batches in flight at once per segment.
+        submit_timeout (float): Seconds to keep retrying a batch while the
+            pool raises ``PoseQueueFull``.
+        segments (int | None): Segments to split the video into; defaults to
+            the pool's worker count. Short videos get fewer segments.
+
+    Returns:
+        dict: Video info, a per-frame ``timeline`` of flags and rep counts, and
+        the rep/mistake ``summary`` in the shape of ``ExerciseDataUpdate``.
+
+    Raises:
+        PoseQueueFull: If the workers had no room for a batch within ``submit_timeout``.
+    """
+    rules = EXERCISE_RULES[exercise]
+    info = await asyncio.get_running_loop().run_in_executor(None, video_info, path)
+    bounds = _segment_bounds(info["frame_count"], every_nth, max_frames, segments or pool.workers)
+
+    session_ids = [uuid.uuid4().hex for _ in bounds]
+    for session_id in session_ids:
+        pool.open_session(session_id, exercise)
+    tasks = [
+        asyncio.ensure_future(_analyze_segment(
+            path, rules, partial(pool.submit_frames, session_id=session_id),
+            start, stop, every_nth, limit, batch_size, window, submit_timeout,
+        ))
+        for session_id, (start, stop, limit) in zip(session_ids, bounds)
+    ]
+    try:
+        parts = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.gather(*(pool.close_session(session_id) for session_id in session_ids))
+
+    counter = RepCounter(exercise)
+    timeline = []
+    for part in parts:
+        for index, time_ms, result in part:
+            entry = {"frame": index, "time_ms": round(time_ms, 1)}
+            if result is None:
+                entry["error"] = "No landmarks detected"
+            else:
+                entry.update(result)
+                entry["rep_count"] = counter.update(result)
+            timeline.append(entry)
+
+    return {
+        "exercise": exercise,
+        **info,
+        "every_nth": every_nth,
+        "frames_analyzed": len(timeline),
+        "timeline": timeline,
+        "summary": counter.summary(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Analyze a recorded set: per-frame form feedback plus rep and mistake summary.",
+    )
+    parser.add_argument("video", help="Path of the video file")
+    parser.add_argument("--exercise", required=True, choices=sorted(EXERCISE_RULES))
+    parser.add_argument("--every-nth", type=int, default=1, help="Analyze one frame out of this many")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="Pose worker processes (default POSE_WORKERS)")
+    parser.add_argument("--output", help="Write the JSON result here instead of stdout")
+    args = parser.parse_args(argv)
+
+    async def run():
+        pool = PoseWorkerPool(**({"workers": args.workers} if args.workers else {}))
+        try:
+            return await analyze_video(
+                args.video, args.exercise, pool, every_nth=args.every_nth, max_frames=args.max_frames,
+            )
+        finally:
+            pool.shutdown()
+
+    result = asyncio.run(run())
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output)
+    else:
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
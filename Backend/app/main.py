@@ -1,8 +1,19 @@
-from datetime import date
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException, Depends, Path
-from schemas.user_exercise import ExerciseDataCreate, ExerciseDataResponse, ExerciseDataUpdate
-from routes import auth, user, exercises
+from fastapi import FastAPI, HTTPException, Depends, Path, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from schemas.user_exercise import (
+    ExerciseDataCreate, ExerciseDataResponse, ExerciseDataUpdate,
+    ExerciseDataBulkItem, ExerciseDataBulkRequest, ExerciseDataBulkResponse,
+    ExerciseDataHistoryPage,
+)
+from routes import auth, user, exercises, metrics, chatbot
 from database import engine
 from models.user import Base, User
 from CRUD import user_exercise, users
@@ -10,6 +21,13 @@ from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine
 from database import get_db
 from fastapi.middleware.cors import CORSMiddleware
 from core.security import get_current_user 
+from core.model_registry import registry
+from core.passwords import password_hasher
+from core.llm import llm_client
+from core.pagination import decode_cursor, encode_cursor
+
+# Largest number of sets accepted by one /Exercise/bulk call
+EXERCISE_BULK_MAX_ITEMS = int(os.getenv("EXERCISE_BULK_MAX_ITEMS", 500))
 
 app = FastAPI(
     title="Exercise Correction API",
@@ -29,6 +47,8 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(user.router, prefix="/users", tags=["Users"])
 app.include_router(exercises.router, prefix="/exercises", tags=["Exercises"])
+app.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
+app.include_router(chatbot.router, prefix="/chatbot", tags=["Chatbot"])
 
 @app.on_event("startup")
 async def on_startup():
@@ -40,6 +60,13 @@ async def on_startup():
             print("Tables created.")
     else:
         print("Error: Engine is not async")
+    # Warm the classifier cache so the first requests don't pay the load cost.
+    await run_in_threadpool(registry.load_all)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    password_hasher.shutdown()
+    await llm_client.aclose()
 
 @app.get("/", tags=["Root"])
 def read_root():
@@ -67,12 +94,13 @@ async def read_user(
 async def read_users(
     skip: int = 0,
     limit: int = 100,
+    after_id: int | None = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    return await users.get_users(db, skip, limit)
+    return await users.get_users(db, skip, limit, after_id)
 
 @app.post("/users", tags=["Users"])
 async def create_user(
@@ -169,6 +197,138 @@ async def create_exercise(
         raise HTTPException(403, "Not enough permissions")
     return await user_exercise.create_user_exercise_data(db, user_id, payload)
 
+@app.post(
+    "/Exercise/bulk",
+    response_model=ExerciseDataBulkResponse,
+)
+async def bulk_upsert_exercises(
+    payload: ExerciseDataBulkRequest,
+    user_id: int | None = None,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Write a batch of sets (e.g. a day synced after being offline) in one transaction.
+
+    Each item is applied as ``PUT /Exercise/{exercise_name}`` would, in order.
+    Results come back per item, with the stored record or the error for that item.
+    """
+    if current_user.role == "user" and user_id == None:
+        user_id = current_user.id
+    elif current_user.role != "admin" and current_user.id != user_id:
+        raise HTTPException(403, "Not enough permissions")
+    if len(payload.items) > EXERCISE_BULK_MAX_ITEMS:
+        raise HTTPException(413, f"At most {EXERCISE_BULK_MAX_ITEMS} items per request")
+
+    today = datetime.utcnow().date()
+    results = [{"index": index} for index in range(len(payload.items))]
+    keys, items = {}, []
+    for index, raw in enumerate(payload.items):
+        try:
+            item = ExerciseDataBulkItem.model_validate(raw)
+        except ValidationError as e:
+            results[index]["error"] = str(e)
+            continue
+        values = item.model_dump(include={"rep_count", "mistake_percentages", "score"}, exclude_none=True)
+        workout_date = item.workout_date or today
+        keys[index] = (item.exercise_name, workout_date)
+        items.append((item.exercise_name, values, workout_date))
+
+    if items:
+        outcome = await user_exercise.bulk_upsert_user_exercise_data(db, user_id, items)
+        for index, key in keys.items():
+            stored = outcome[key]
+            if isinstance(stored, str):
+                results[index]["error"] = stored
+            else:
+                results[index]["record"] = stored
+    return {"results": results}
+
+# Declared before /Exercise/{exercise_name} so "history" and "export" aren't read as names.
+@app.get(
+    "/Exercise/history",
+    response_model=ExerciseDataHistoryPage,
+)
+async def read_history(
+    user_id: int | None = None,
+    exercise_name: str | None = None,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """A page of exercise records ordered by (workout_date, id); follow ``next_cursor`` for more."""
+    if current_user.role == "user" and user_id == None:
+        user_id = current_user.id
+    elif current_user.role != "admin" and current_user.id != user_id:
+        raise HTTPException(403, "Not enough permissions")
+    after = None
+    if cursor is not None:
+        try:
+            last_date, last_id = decode_cursor(cursor)
+            after = (date.fromisoformat(last_date), int(last_id))
+        except (ValueError, TypeError):
+            raise HTTPException(400, "Invalid cursor")
+
+    records = await user_exercise.get_user_exercise_history(
+        db, user_id, limit, after, exercise_name, start_date, end_date
+    )
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        last = records[-1]
+        next_cursor = encode_cursor(last.workout_date.isoformat(), last.id)
+    return {"items": records, "next_cursor": next_cursor}
+
+def _ndjson_lines(chunks):
+    async def lines():
+        async for chunk in chunks:
+            yield "".join(json.dumps(dict(row), default=str) + "\n" for row in chunk)
+    return lines()
+
+def _csv_lines(chunks):
+    columns = [column.key for column in user_exercise.EXPORT_COLUMNS]
+    async def lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        async for chunk in chunks:
+            for row in chunk:
+                writer.writerow([
+                    json.dumps(row[column]) if column == "mistake_percentages" else row[column]
+                    for column in columns
+                ])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    return lines()
+
+@app.get("/Exercise/export")
+async def export_history(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: int | None = None,
+    exercise_name: str | None = None,
+    start_date: date | None = None,
+    end_date: date | None = None,
+    current_user=Depends(get_current_user),
+):
+    """Stream every matching record as NDJSON or CSV without loading the history into memory."""
+    if current_user.role == "user" and user_id == None:
+        user_id = current_user.id
+    elif current_user.role != "admin" and current_user.id != user_id:
+        raise HTTPException(403, "Not enough permissions")
+    chunks = user_exercise.stream_user_exercise_history(user_id, exercise_name, start_date, end_date)
+    if format == "csv":
+        return StreamingResponse(
+            _csv_lines(chunks),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="exercise_history.csv"'},
+        )
+    return StreamingResponse(_ndjson_lines(chunks), media_type="application/x-ndjson")
+
 @app.put(
     "/Exercise/{exercise_name}",
     response_model=ExerciseDataResponse
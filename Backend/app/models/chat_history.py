@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, String, Text, Index
+from datetime import datetime
+from database import Base
+
+class ChatHistory(Base):
+    """One chatbot message. Rows are only ever appended."""
+    __tablename__ = "chat_history"
+    __table_args__ = (
+        # Every read is "a user's messages after a point, in order"
+        Index("ix_chat_history_user_created", "user_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    role = Column(String(16), nullable=False)  # "user" or "assistant"
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class ChatSummary(Base):
+    """
+    Rolling summary of a user's older chat messages.
+
+    Covers every message up to (``summarized_through_at``, ``summarized_through_id``);
+    later messages are still read verbatim.
+    """
+    __tablename__ = "chat_summaries"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    summary = Column(Text, nullable=False, default="")
+    summarized_through_at = Column(DateTime, nullable=True)
+    summarized_through_id = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
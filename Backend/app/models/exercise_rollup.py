@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, String, Date
+from datetime import datetime
+from database import Base
+
+class ExerciseRollup(Base):
+    """
+    Running totals of the sets a user logged, per exercise and period.
+
+    ``period`` is "day", "week" (``period_start`` is the Monday) or "all"
+    (``period_start`` is ``CRUD.rollups.ALL_TIME``); ``exercise_name`` "*" holds
+    the user's totals across exercises. Maintained by ``CRUD.rollups`` on every
+    write to ``user_exercise_data``.
+    """
+    __tablename__ = "exercise_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    exercise_name = Column(String, primary_key=True)
+    period = Column(String(8), primary_key=True)
+    period_start = Column(Date, primary_key=True)
+
+    sets = Column(Integer, nullable=False, default=0)
+    # Sets that reported a score, the denominator of the average score
+    scored_sets = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    rep_total = Column(Integer, nullable=False, default=0)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ExerciseMistakeRollup(Base):
+    """How often each mistake was reported, over the same buckets as ``ExerciseRollup``."""
+    __tablename__ = "exercise_mistake_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    exercise_name = Column(String, primary_key=True)
+    period = Column(String(8), primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    mistake = Column(String, primary_key=True)
+
+    # Sets in which the mistake showed up at all
+    occurrences = Column(Integer, nullable=False, default=0)
+    # Sum of the per-set mistake percentages
+    percentage_sum = Column(Float, nullable=False, default=0.0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, String, Date
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, String, Date, Index
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -7,9 +7,20 @@ from database import Base
 
 class UserExerciseData(Base):
     __tablename__ = "user_exercise_data"
+    __table_args__ = (
+        # One row per user, exercise and day: the key every read filters on and
+        # the conflict target of the upserts in CRUD.user_exercise.
+        Index(
+            "uq_user_exercise_data_user_exercise_date",
+            "user_id", "exercise_name", "workout_date",
+            unique=True,
+        ),
+        # Keyset pagination and export of a user's history, ordered by (workout_date, id)
+        Index("ix_user_exercise_data_user_date_id", "user_id", "workout_date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     exercise_name = Column(String, nullable=False)
     
     rep_count = Column(Integer, default=0)  
@@ -18,7 +29,7 @@ class UserExerciseData(Base):
     score = Column(Float, default=0.0)
 
     total_attempts = Column(Integer, default=0)
-    workout_date = Column(Date, default=lambda: datetime.utcnow().date())
+    workout_date = Column(Date, nullable=False, default=lambda: datetime.utcnow().date())
     created_at = Column(DateTime, default=datetime.utcnow)
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
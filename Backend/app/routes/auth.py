@@ -21,7 +21,7 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Email is already registered.")
 
         # Hash the password
-        hashed_password = hash_password(user.password)
+        hashed_password = await hash_password(user.password)
 
         # Create and add a new user
         new_user = User(username=user.username, email=user.email, hashed_password=hashed_password)
@@ -59,7 +59,7 @@ async def login_token(
     result = await db.execute(stmt)
     user = result.scalars().first()
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
     # Update here: Use user.id rather than user.email
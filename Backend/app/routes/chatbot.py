@@ -1,94 +1,223 @@
 # routes/chatbot.py
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+import json
+import logging
+import os
+import weakref
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict
 from core.security import get_current_user  
-from database import get_db
+from database import get_db, async_session
 from models.user import User
-from CRUD import user_exercise
+from CRUD import rollups, chat_history
+from core.llm import LLMError, llm_client
 
 router = APIRouter()
+logger = logging.getLogger("chatbot")
+
+# Most recent turns (a user message and its reply) sent to the model verbatim
+CHAT_CONTEXT_TURNS = int(os.getenv("CHAT_CONTEXT_TURNS", 6))
+# Older turns are folded into the rolling summary this many at a time,
+# so summarizing costs one extra model call per batch rather than per message.
+CHAT_SUMMARY_BATCH_TURNS = int(os.getenv("CHAT_SUMMARY_BATCH_TURNS", 10))
+CHAT_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", 2000))
 
 async def get_personalized_insights(user_id: int, db: AsyncSession) -> str:
     """
-    Compute personalized insights for the user based on recent workout data.
+    Compute personalized insights for the user from their workout rollups.
     
-    This function queries the user's exercise data and computes, for example, 
-    an average correct form percentage. You can expand this with more analytics.
+    Reads the precomputed all-time and current-week totals and the most frequent
+    mistakes, so the cost doesn't grow with the length of the user's history.
     """
-    exercise_data = await user_exercise.get_user_exercise_data(db, user_id)
-    if exercise_data:
-        total_correct = sum(item.correct_percentage for item in exercise_data)
-        count = len(exercise_data)
-        avg_correct = total_correct / count if count > 0 else 0
-        insights = f"Your average correct form percentage is {avg_correct:.2f}%. "
-        if avg_correct >= 80:
-            insights += "Great job maintaining good form!"
+    all_time = {rollup.exercise_name: rollup for rollup in await rollups.get_rollups(db, user_id, "all")}
+    total = all_time.pop(rollups.ALL_EXERCISES, None)
+    if total is None or not total.sets:
+        return "No exercise data available to provide insights."
+
+    insights = f"You have logged {total.sets} sets and {total.rep_total} reps. "
+    if total.scored_sets:
+        avg_score = total.score_sum / total.scored_sets
+        insights += f"Your average form score is {avg_score:.2f}%. "
+        if avg_score >= 80:
+            insights += "Great job maintaining good form! "
         else:
-            insights += "Consider focusing on improving your form."
-        return insights
-    return "No exercise data available to provide insights."
+            insights += "Consider focusing on improving your form. "
+    scored = [rollup for rollup in all_time.values() if rollup.scored_sets]
+    if len(scored) > 1:
+        weakest = min(scored, key=lambda rollup: rollup.score_sum / rollup.scored_sets)
+        insights += (
+            f"Your weakest exercise is {weakest.exercise_name} "
+            f"({weakest.score_sum / weakest.scored_sets:.2f}% average). "
+        )
+    top_mistakes = await rollups.get_top_mistakes(db, user_id)
+    if top_mistakes:
+        insights += "Most frequent mistakes: " + ", ".join(
+            f"{mistake.mistake} ({mistake.occurrences / total.sets * 100:.0f}% of sets)"
+            for mistake in top_mistakes
+        ) + ". "
+    this_week = [rollup for rollup in await rollups.get_rollups(db, user_id, "week") if rollup.exercise_name == rollups.ALL_EXERCISES]
+    if this_week:
+        insights += f"This week: {this_week[0].sets} sets, {this_week[0].rep_total} reps."
+    return insights.strip()
+
+def format_messages(messages: list) -> str:
+    return "\n".join(
+        f"{'User' if message.role == 'user' else 'Assistant'}: {message.content}"
+        for message in messages
+    )
 
 async def get_previous_chats(user_id: int, db: AsyncSession) -> str:
     """
-    Retrieve a summary of previous chat interactions for the user.
-    
-    In a production system, you might query a ChatHistory table.
-    For demonstration purposes, we return a simulated summary.
+    Build the conversation context for the prompt: the rolling summary plus the last turns.
+
+    Both reads are bounded (one primary-key lookup and at most
+    ``CHAT_CONTEXT_TURNS`` turns), so the context and its cost stay the same
+    size however long the conversation gets.
     """
-    # TODO: Replace this with an actual query to your chat history table if available.
-    return "In your last chat, you asked about recovery tips after intense workouts."
+    summary = await chat_history.get_summary(db, user_id)
+    recent = await chat_history.get_unsummarized_messages(db, user_id, summary, 2 * CHAT_CONTEXT_TURNS)
+    parts = []
+    if summary is not None and summary.summary:
+        parts.append(f"Summary of earlier conversation: {summary.summary}")
+    if recent:
+        parts.append(format_messages(recent))
+    return "\n".join(parts) or "No previous conversation."
 
-import os
-import httpx
-from fastapi import HTTPException
+# One summarizing task per user at a time in this process; save_summary guards across processes.
+_summary_locks = weakref.WeakValueDictionary()
 
-async def call_language_model_api(prompt: str) -> str:
+async def summarize_chat_history(user_id: int):
     """
-    Calls the OpenAI API to generate a response based on the provided prompt.
-    
-    This implementation uses httpx.AsyncClient to asynchronously call the API.
-    Ensure that the environment variable OPENAI_API_KEY is set with your API key.
-    
+    Fold the turns older than the last ``CHAT_CONTEXT_TURNS`` into the rolling summary.
+
+    Runs after the response is sent, in its own session, and does nothing until
+    ``CHAT_SUMMARY_BATCH_TURNS`` turns have piled up past the context window.
+    The oldest unsummarized batch is folded first, and batches are folded until
+    the backlog is below that threshold again. The model updates the previous
+    summary with just the folded messages, so full history is never re-read. If
+    the model is unavailable the messages are appended to the summary verbatim
+    (truncated), so the backlog still clears.
+    """
+    keep = 2 * CHAT_CONTEXT_TURNS
+    batch = 2 * CHAT_SUMMARY_BATCH_TURNS
+    lock = _summary_locks.setdefault(user_id, asyncio.Lock())
+    async with lock, async_session() as db:
+        while True:
+            summary = await chat_history.get_summary(db, user_id)
+            if await chat_history.count_unsummarized_messages(db, user_id, summary) < keep + batch:
+                return
+            to_fold = await chat_history.get_oldest_unsummarized_messages(db, user_id, summary, batch)
+            previous = summary.summary if summary is not None else ""
+            prompt = (
+                "Update the summary of a fitness coaching conversation with the new messages. "
+                "Keep the user's goals, injuries, preferences and the advice already given. "
+                "Answer with the updated summary only.\n"
+                f"Current summary: {previous or 'None'}\n"
+                f"New messages:\n{format_messages(to_fold)}\n"
+                "Updated summary:"
+            )
+            try:
+                text = (await llm_client.complete(prompt))[:CHAT_SUMMARY_MAX_CHARS]
+            except LLMError as e:
+                logger.warning("Chat summary for user %s fell back to truncation: %s", user_id, e)
+                text = f"{previous}\n{format_messages(to_fold)}"[-CHAT_SUMMARY_MAX_CHARS:]
+            if not await chat_history.save_summary(db, user_id, text.strip(), to_fold[-1], summary):
+                # Another worker folded these messages first; start over from its summary.
+                logger.info("Chat summary for user %s changed while folding; retrying", user_id)
+
+async def call_language_model_api(prompt: str, cache_key: str | None = None) -> str:
+    """
+    Generate a response to the prompt with the shared language model client.
+
+    Connection pooling, the concurrency cap, retries and the response cache are
+    handled by ``core.llm``; see ``LLM_*`` settings there. The response is only
+    cached under ``cache_key``, when one is given.
+
     Returns:
         A string containing the generated text.
-    
+
     Raises:
         HTTPException: If the API call fails or the response format is unexpected.
     """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY environment variable is not set.")
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    url = "https://api.openai.com/v1/completions"
-    payload = {
-        "model": "text-davinci-003", 
-        "prompt": prompt,
-        "max_tokens": 150,
-        "temperature": 0.7,
-    }
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, json=payload)
+    try:
+        return await llm_client.complete(prompt, cache_key)
+    except LLMError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+
+async def _in_own_session(lookup, user_id: int):
+    # An AsyncSession can't run two queries at once, so concurrent lookups each get one.
+    async with async_session() as session:
+        return await lookup(user_id, session)
+
+def build_prompt(insights: str, previous_chats: str, message: str) -> str:
+    return (
+        f"User Insights: {insights}\n"
+        f"Previous Chat History: {previous_chats}\n"
+        f"User Query: {message}\n"
+        "Response:"
+    )
+
+def _sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+async def stream_chat_response(user_id: int, message: str, prompt: str, cache_key: str | None = None):
+    """
+    Start the completion and return an SSE response that forwards it token by token.
+
+    The first piece is awaited before the response starts, so a failing model
+    call still surfaces as an HTTP error status. Events are ``data: {"token"}``
+    per piece, then ``event: done`` with the full response; any failure
+    mid-stream is logged and reported as ``event: error`` with the partial
+    response. The turn, partial or not, is stored once the stream ends, and
+    summarizing runs after the response is closed.
+    """
+    pieces = llm_client.stream(prompt, cache_key)
+    try:
+        first = await anext(pieces)
+    except StopAsyncIteration:
+        raise HTTPException(status_code=500, detail="Chatbot failed to generate a response.")
+    except LLMError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+
+    async def events():
+        received = [first]
+        yield _sse({"token": first})
+        error = None
         try:
-            response.raise_for_status()  # Raise error for HTTP errors
-        except httpx.HTTPStatusError as exc:
-            raise HTTPException(status_code=exc.response.status_code, 
-                                detail=f"OpenAI API error: {exc.response.text}") from exc
-        
-        data = response.json()
-        if "choices" in data and len(data["choices"]) > 0:
-            return data["choices"][0]["text"].strip()
+            async for piece in pieces:
+                received.append(piece)
+                yield _sse({"token": piece})
+        except LLMError as exc:
+            logger.warning("Chat stream for user %s interrupted: %s", user_id, exc)
+            error = str(exc)
+        except Exception as exc:
+            logger.exception("Chat stream for user %s failed", user_id)
+            error = f"Chatbot stream failed: {exc}"
+        # What the user saw is kept in the history, even if the stream broke off.
+        response = "".join(received).strip()
+        async with async_session() as session:
+            await chat_history.append_messages(session, user_id, [("user", message), ("assistant", response)])
+        if error is not None:
+            yield _sse({"error": error, "response": response}, event="error")
         else:
-            raise HTTPException(status_code=500, detail="Unexpected response format from language model API.")
+            yield _sse({"response": response}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(summarize_chat_history, user_id),
+    )
 
 @router.post("/", tags=["Chatbot"])
 async def chat_with_bot(
     message: str,
+    background_tasks: BackgroundTasks,
+    stream: bool = False,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ) -> Dict[str, str]:
@@ -97,25 +226,31 @@ async def chat_with_bot(
     and previous conversation history.
     
     Steps:
-      1. Retrieve personalized workout insights.
-      2. Retrieve a summary of previous chat interactions.
-      3. Combine these with the current query into a prompt.
-      4. Call the language model API (or simulate it) to generate a response.
+      1. Retrieve personalized workout insights and a summary of previous chat
+         interactions, concurrently.
+      2. Combine these with the current query into a prompt.
+      3. Call the language model API (or simulate it) to generate a response.
+      4. Store the turn, and fold older turns into the summary in the background.
     
     Returns:
-      A JSON object with the chatbot's response.
+      A JSON object with the chatbot's response, or with ``stream=true`` a
+      ``text/event-stream`` of tokens as they are generated.
     """
-    insights = await get_personalized_insights(current_user.id, db)
-    previous_chats = await get_previous_chats(current_user.id, db)
-    prompt = (
-        f"User Insights: {insights}\n"
-        f"Previous Chat History: {previous_chats}\n"
-        f"User Query: {message}\n"
-        "Response:"
+    insights, previous_chats = await asyncio.gather(
+        _in_own_session(get_personalized_insights, current_user.id),
+        _in_own_session(get_previous_chats, current_user.id),
     )
-    
-    response = await call_language_model_api(prompt)
+    prompt = build_prompt(insights, previous_chats, message)
+    # The same question against the same workout insights reuses its answer;
+    # the chat history changes every turn and is left out of the key.
+    cache_key = llm_client.cache_key(message, f"{current_user.id}\0{insights}")
+    if stream:
+        return await stream_chat_response(current_user.id, message, prompt, cache_key)
+
+    response = await call_language_model_api(prompt, cache_key)
     if not response:
         raise HTTPException(status_code=500, detail="Chatbot failed to generate a response.")
-    
+
+    await chat_history.append_messages(db, current_user.id, [("user", message), ("assistant", response)])
+    background_tasks.add_task(summarize_chat_history, current_user.id)
     return {"response": response}
@@ -1,65 +1,249 @@
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, WebSocket, status
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import numpy as np
-import pickle
+from functools import partial
+from core.batching import MicroBatcher
+from core.dense_model import class_labels
+from core.frame_cache import FRAME_CACHE_SIZE, CacheMetrics, FrameResultCache, quantize_landmarks
+from core.landmarks import MODEL_FEATURES, point_landmarks, points_to_array
+from core.model_registry import registry
+from core.rep_counter import RepCounter, exercise_key
+from core.security import get_user_from_token
+from core.streaming import StreamSession, run_stream
+from database import async_session
+from CRUD import user_exercise
+from schemas.user_exercise import ExerciseDataUpdate
+from schemas.exercise_frames import LandmarkBatch
 
 router = APIRouter()
 
-# Utility to load a model from a pickle file
-def load_model(path):
-    with open(path, 'rb') as model_file:
-        return pickle.load(model_file)
+def plank_labels(prediction):
+    return {
+        "back_too_low": int(prediction == 2),
+        "back_too_high": int(prediction == 1),
+        "correct": int(prediction == 0)
+    }
+
+def bicep_curls_labels(prediction):
+    return {
+        "leaned_back": int(prediction == 0),
+        "correct": int(prediction == 1)
+    }
+
+def lunges_labels(prediction):
+    return {
+        "knee_over_toe": int(prediction == 0),
+        "correct": int(prediction == 1)
+    }
+
+# exercise -> (registered model, registered input scaler or None, label decoder)
+CLASSIFIERS = {
+    "plank": ("plank", "plank_scaler", plank_labels),
+    "bicep_curls": ("bicep_curls", None, bicep_curls_labels),
+    "lunges": ("lunges", None, lunges_labels),
+}
+
+def frame_features(exercise: str, data: dict) -> np.ndarray:
+    """
+    Build one classifier input row from a request body.
+
+    ``points`` are the model's landmarks already selected by the client, as
+    rows or ``{"x", "y", "z", "visibility"}`` objects. Objects that carry their
+    MediaPipe ``landmark`` index are reordered to the model's training order;
+    unnamed points must already be in that order (``MODEL_FEATURES``). The
+    plank and lunges models also take visibility, so their points need all
+    four values; extra values are ignored. ``landmarks`` is the full
+    33-landmark pose; the server then picks the landmarks and columns the model
+    was trained on.
+
+    Raises:
+        ValueError: If the points don't have the shape the model was trained on.
+    """
+    spec = MODEL_FEATURES[exercise]
+    if data.get("landmarks") is not None:
+        features = spec.select(points_to_array(data["landmarks"]))
+    else:
+        points = data["points"]
+        features = spec.select_points(points_to_array(points), point_landmarks(points))
+    if features.shape != (spec.size,):
+        raise ValueError(f"expected {spec.size} values, got {features.size}")
+    return features
+
+def classify(exercise: str, frames: list) -> list:
+    """
+    Run one vectorized predict over many landmark frames of the same exercise.
+
+    Args:
+        exercise (str): A key of ``CLASSIFIERS``.
+        frames (list): One feature row per frame, as built by ``frame_features``.
+
+    Returns:
+        list: The decoded label dict for each frame, in input order.
+    """
+    model_name, scaler_name, decode = CLASSIFIERS[exercise]
+    features = np.stack(frames)
+    if scaler_name:
+        features = registry.get(scaler_name).transform(features)
+    # Keras models return probabilities, the NumPy exports and scikit-learn labels
+    predictions = class_labels(registry.get(model_name).predict(features))
+    return [decode(prediction) for prediction in predictions]
+
+# Concurrent single-frame requests are coalesced into one predict per model.
+batchers = {
+    exercise: MicroBatcher(partial(classify, exercise), name=exercise)
+    for exercise in CLASSIFIERS
+}
+# Hits and misses of every streaming session's frame cache
+frame_cache_metrics = CacheMetrics()
 
 @router.post("/plank/")
 async def plank(data: dict = Body(..., embed=True)):
 
-    points = data.get("points")
-    if not points:
+    if not data.get("points") and not data.get("landmarks"):
         return JSONResponse(content={"error": "Missing points data"}, status_code=400)
+    try:
+        features = frame_features("plank", data)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return JSONResponse(content={"error": f"Invalid points data: {e}"}, status_code=400)
 
-    # Load trained model
-    plank_model = load_model('../../../models/Planks/plank_dp_model.h5')
-
-    # Prepare features
-    features = np.array(points).flatten().reshape(1, -1)
-    predictions = plank_model.predict(features)
-
-    return JSONResponse(content={
-        "back_too_low": int(predictions[0] == 2),
-        "back_too_high": int(predictions[0] == 1),
-        "correct": int(predictions[0] == 0)
-    }, status_code=200)
+    return JSONResponse(content=await batchers["plank"].submit(features), status_code=200)
 
 @router.post("/bicep-curls/")
 async def bicep_curls(data: dict = Body(..., embed=True)):
 
-    points = data.get("points")
-    if not points:
+    if not data.get("points") and not data.get("landmarks"):
         return JSONResponse(content={"error": "Missing points data"}, status_code=400)
+    try:
+        features = frame_features("bicep_curls", data)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return JSONResponse(content={"error": f"Invalid points data: {e}"}, status_code=400)
 
-    bicep_model = load_model('../../../models/bicep_curls/dnn_model.pkl')
-
-    features = np.array(points).flatten().reshape(1, -1)
-    predictions = bicep_model.predict(features)
-
-    return JSONResponse(content={
-        "leaned_back": int(predictions[0] == 0),
-        "correct": int(predictions[0] == 1)
-    }, status_code=200)
+    return JSONResponse(content=await batchers["bicep_curls"].submit(features), status_code=200)
 
 @router.post("/lunges/")
 async def lunges(data: dict = Body(..., embed=True)):
 
-    points = data.get("points")
-    if not points:
+    if not data.get("points") and not data.get("landmarks"):
         return JSONResponse(content={"error": "Missing points data"}, status_code=400)
-
-    lunges_model = load_model('../../../models/Lunges/lunges_model_logistic_regression.pkl')
-
-    features = np.array(points).flatten().reshape(1, -1)
-    predictions = lunges_model.predict(features)
-
-    return JSONResponse(content={
-        "knee_over_toe": int(predictions[0] == 0),
-        "correct": int(predictions[0] == 1)
-    }, status_code=200)
+    try:
+        features = frame_features("lunges", data)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        return JSONResponse(content={"error": f"Invalid points data: {e}"}, status_code=400)
+
+    return JSONResponse(content=await batchers["lunges"].submit(features), status_code=200)
+
+@router.post("/batch/")
+async def classify_batch(batch: LandmarkBatch):
+    """
+    Classify many landmark frames, from one session or many, in a single call.
+
+    Frames are grouped by exercise and each group runs through its model as one
+    stacked matrix. Results come back in the order the frames were sent. A frame
+    whose points are malformed reports its own ``error``; a group whose model
+    cannot run reports an ``error`` for each of its frames.
+    """
+    groups = {}
+    for index, frame in enumerate(batch.frames):
+        if frame.exercise not in CLASSIFIERS:
+            return JSONResponse(
+                content={"error": f"Unknown exercise '{frame.exercise}' at frame {index}"},
+                status_code=400
+            )
+        groups.setdefault(frame.exercise, []).append(index)
+
+    results = [None] * len(batch.frames)
+    for exercise, indices in groups.items():
+        valid, features = [], []
+        for i in indices:
+            try:
+                features.append(frame_features(exercise, batch.frames[i].model_dump()))
+                valid.append(i)
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                results[i] = {"session_id": batch.frames[i].session_id, "error": f"Invalid points data: {e}"}
+        if not valid:
+            continue
+        try:
+            labels = await run_in_threadpool(classify, exercise, features)
+        except Exception as e:
+            labels = [{"error": str(e)}] * len(valid)
+        for i, label in zip(valid, labels):
+            results[i] = {"session_id": batch.frames[i].session_id, **label}
+
+    return JSONResponse(content={"results": results}, status_code=200)
+
+async def flush_session(session: StreamSession):
+    """Write the session's set aggregate to user_exercise_data and start a new set."""
+    counter = session.state.get("reps")
+    if counter is None or not counter.frames:
+        return None
+    summary = counter.summary()
+    # rep_count is None for classifiers without phase flags, keeping the stored count
+    async with async_session() as db:
+        await user_exercise.update_user_exercise_data(
+            db, session.user_id, exercise_key(session.exercise), ExerciseDataUpdate(
+                rep_count=summary["rep_count"],
+                mistake_percentages=summary["mistake_percentages"],
+                score=summary["score"],
+            )
+        )
+    session.state["reps"] = RepCounter(session.exercise, count_reps=counter.count_reps)
+    return summary
+
+async def classify_message(session: StreamSession, message):
+    if message.get("action") == "finish":
+        return {"summary": await flush_session(session)}
+
+    if not message.get("points") and not message.get("landmarks"):
+        return {"error": "Missing points data"}
+    features = frame_features(session.exercise, message)
+    cache = session.state.get("frame_cache")
+    if cache is None:
+        labels = await batchers[session.exercise].submit(features)
+    else:
+        # Held positions repeat the same quantized landmarks; reuse their labels.
+        key = quantize_landmarks(features)
+        labels = cache.get(key)
+        if labels is None:
+            labels = await batchers[session.exercise].submit(features)
+            cache.set(key, labels)
+    return {**labels, "rep_count": session.state["reps"].update(labels)}
+
+@router.websocket("/{exercise}/ws")
+async def stream_exercise(websocket: WebSocket, exercise: str, token: str | None = None):
+    """
+    Stream landmark frames over one socket and get per-frame labels back.
+
+    The client authenticates once with ``?token=<access token>`` and then sends
+    JSON messages ``{"points": [...]}`` or ``{"landmarks": [...]}``; each reply carries the labels, the running
+    ``rep_count`` and the frame's ``seq``. Frames that arrive while one is still
+    being classified are dropped except for the newest, so feedback never lags
+    behind the client.
+
+    ``{"action": "finish"}`` ends the set: its rep count (when the exercise's
+    labels carry phase flags), mistake percentages and score are written to user_exercise_data and returned as ``summary``. A set
+    still open when the socket closes is written the same way.
+
+    With ``FRAME_CACHE_SIZE`` set, frames whose landmarks round to those of a
+    recent frame reuse its labels without running the model.
+    """
+    exercise = exercise.replace("-", "_")
+    if exercise not in CLASSIFIERS or not token:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    async with async_session() as db:
+        user = await get_user_from_token(token, db)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    session = StreamSession(websocket, exercise, user.id)
+    session.state["reps"] = RepCounter(exercise, count_reps=exercise != "plank")
+    if FRAME_CACHE_SIZE > 0:
+        session.state["frame_cache"] = FrameResultCache(metrics=frame_cache_metrics)
+    try:
+        await run_stream(session, classify_message)
+    finally:
+        await flush_session(session)
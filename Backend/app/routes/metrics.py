@@ -0,0 +1,44 @@
+from fastapi import APIRouter
+from core.model_registry import registry
+from database import pool_stats
+from core.security import user_cache
+from core.passwords import password_hasher
+from core.llm import llm_client
+from routes.exercises import batchers, frame_cache_metrics
+
+router = APIRouter()
+
+@router.get("/models")
+async def model_stats():
+    """Load time, memory and reload count for every resident classifier."""
+    return registry.stats()
+
+@router.get("/batching")
+async def batching_stats():
+    """Batch counts and mean batch size for each classifier's micro-batcher."""
+    return {name: batcher.stats() for name, batcher in batchers.items()}
+
+@router.get("/frame-cache")
+async def frame_cache_stats():
+    """Hit rate of the streaming sessions' caches of labels for repeated landmark frames."""
+    return frame_cache_metrics.stats()
+
+@router.get("/auth-cache")
+async def auth_cache_stats():
+    """Hit rate and size of the authenticated-user cache."""
+    return user_cache.stats()
+
+@router.get("/passwords")
+async def password_stats():
+    """Queue wait and run time of bcrypt hashing and verification."""
+    return password_hasher.stats()
+
+@router.get("/database")
+async def database_stats():
+    """Connection pool occupancy, checkout wait times and time spent opening connections."""
+    return pool_stats()
+
+@router.get("/llm")
+async def llm_stats():
+    """Language model requests, retries, in-flight calls and response cache hit rate."""
+    return llm_client.stats()
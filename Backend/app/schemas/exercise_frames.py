@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Any, List, Optional
+
+class LandmarkFrame(BaseModel):
+    exercise: str
+    # The model's landmarks as {"x", "y", "z", "visibility", "landmark"} objects
+    # (or unnamed rows in training order)...
+    points: Optional[List[Any]] = None
+    # ...or the full 33-landmark pose, from which the server selects them
+    landmarks: Optional[List[Any]] = None
+    session_id: Optional[str] = None
+
+class LandmarkBatch(BaseModel):
+    frames: List[LandmarkFrame]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 from datetime import date, datetime
 
 class ExerciseDataBase(BaseModel):
@@ -27,3 +27,29 @@ class ExerciseDataResponse(ExerciseDataBase):
 
     class Config:
         orm_mode = True
+
+
+class ExerciseDataBulkItem(BaseModel):
+    """One set in a bulk sync: a create payload, or an update with only some fields."""
+    exercise_name: str
+    rep_count: Optional[int] = None
+    mistake_percentages: Optional[Dict[str, float]] = None
+    score: Optional[float] = None
+    workout_date: Optional[date] = None
+
+class ExerciseDataBulkRequest(BaseModel):
+    # Validated item by item so one malformed set doesn't reject the whole sync
+    items: List[Dict[str, Any]]
+
+class ExerciseDataBulkResult(BaseModel):
+    index: int
+    record: Optional[ExerciseDataResponse] = None
+    error: Optional[str] = None
+
+class ExerciseDataBulkResponse(BaseModel):
+    results: List[ExerciseDataBulkResult]
+
+class ExerciseDataHistoryPage(BaseModel):
+    items: List[ExerciseDataResponse]
+    # Pass back as ``cursor`` for the next page; None on the last page
+    next_cursor: Optional[str] = None
@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+from core.batching import MicroBatcher
+
+
+def test_results_are_returned_in_order():
+    async def run():
+        batcher = MicroBatcher(lambda items: [item * 2 for item in items], max_wait_ms=1)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5))), batcher
+
+    results, batcher = asyncio.run(run())
+    assert results == [0, 2, 4, 6, 8]
+    assert batcher.batches == 1
+
+
+@pytest.mark.parametrize("extra", [-1, 1])
+def test_result_count_mismatch_fails_every_item(extra):
+    calls = []
+
+    async def batch_fn(items):
+        calls.append(list(items))
+        return [None] * (len(items) + extra)
+
+    async def run():
+        batcher = MicroBatcher(batch_fn, max_wait_ms=1, name="model")
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert "model returned" in str(results[0])
+    # Not retried item by item: the batch function didn't raise
+    assert calls == [[0, 1, 2]]
+
+
+def test_failing_batch_only_fails_the_bad_item():
+    def batch_fn(items):
+        if "bad" in items:
+            raise ValueError("bad item")
+        return items
+
+    async def run():
+        batcher = MicroBatcher(batch_fn, max_wait_ms=1)
+        return await asyncio.gather(*(batcher.submit(i) for i in ("a", "bad", "c")), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert results[0] == "a" and results[2] == "c"
+    assert isinstance(results[1], ValueError)
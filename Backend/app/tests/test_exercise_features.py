@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from core.landmarks import MODEL_FEATURES
+from routes import exercises
+
+client = TestClient(FastAPI(routes=exercises.router.routes))
+
+
+def _points(count: int, visibility: bool):
+    keys = ("x", "y", "z", "visibility") if visibility else ("x", "y", "z")
+    return [{key: 0.1 * i + 0.01 * j for j, key in enumerate(keys)} for i in range(count)]
+
+
+def test_plank_points_without_visibility_are_rejected():
+    # 17 points x (x, y, z) = 51 values, but the model takes 68
+    with pytest.raises(ValueError, match="visibility"):
+        exercises.frame_features("plank", {"points": _points(17, visibility=False)})
+
+    response = client.post("/plank/", json={"data": {"points": _points(17, visibility=False)}})
+    assert response.status_code == 400
+    assert "visibility" in response.json()["error"]
+
+
+def test_plank_points_with_visibility():
+    points = _points(17, visibility=True)
+    features = exercises.frame_features("plank", {"points": points})
+    assert features.shape == (68,)
+    np.testing.assert_allclose(features[:4], list(points[0].values()))
+
+
+def test_plank_endpoint_classifies_points_with_visibility():
+    # The plank input scaler is a scikit-learn pickle
+    pytest.importorskip("sklearn")
+    response = client.post("/plank/", json={"data": {"points": _points(17, visibility=True)}})
+    assert response.status_code == 200
+    assert set(response.json()) == {"back_too_low", "back_too_high", "correct"}
+
+
+def test_points_and_landmarks_give_the_same_features():
+    spec = MODEL_FEATURES["plank"]
+    pose = np.random.default_rng(0).random((33, 4), dtype=np.float32)
+    points = pose[spec.landmarks].tolist()
+    np.testing.assert_array_equal(
+        exercises.frame_features("plank", {"points": points}),
+        exercises.frame_features("plank", {"landmarks": pose.tolist()}),
+    )
+
+
+def test_lunges_points_need_visibility():
+    # 10 points x (x, y, z) = 30 values, but the model takes 40
+    with pytest.raises(ValueError, match="visibility"):
+        exercises.frame_features("lunges", {"points": _points(10, visibility=False)})
+    assert exercises.frame_features("lunges", {"points": _points(10, visibility=True)}).shape == (40,)
+
+
+def test_named_points_are_put_in_training_order():
+    spec = MODEL_FEATURES["bicep_curls"]
+    pose = np.random.default_rng(1).random((33, 4), dtype=np.float32)
+    # The web client's order: left elbow and wrist before the right ones
+    client_order = [0, 11, 12, 13, 14, 15, 16, 23, 24]
+    assert client_order != spec.landmarks.tolist()
+    points = [
+        {"landmark": i, "x": float(pose[i, 0]), "y": float(pose[i, 1]), "z": float(pose[i, 2]), "visibility": float(pose[i, 3])}
+        for i in client_order
+    ]
+    np.testing.assert_array_equal(
+        exercises.frame_features("bicep_curls", {"points": points}),
+        exercises.frame_features("bicep_curls", {"landmarks": pose.tolist()}),
+    )
+
+    with pytest.raises(ValueError, match="missing points"):
+        exercises.frame_features("bicep_curls", {"points": points[:-1]})
@@ -7,7 +7,7 @@ import sys
 from alembic import context
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from Backend.app.database import Base 
-from Backend.app.models import user_exercise_data, user
+from Backend.app.models import user_exercise_data, user, exercise_rollup, chat_history
 
 
 target_metadata = Base.metadata
@@ -0,0 +1,95 @@
+"""one user_exercise_data row per user, exercise and day
+
+Base revision of the migration history. It does not create the tables: they
+come from ``Base.metadata.create_all``, which the main API runs on startup, so
+start the API once against a new database before ``alembic upgrade head``.
+
+Revision ID: 3f2a9c1d4b7e
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f2a9c1d4b7e'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("user_exercise_data"):
+        raise RuntimeError(
+            "user_exercise_data does not exist: start the main API once to create "
+            "the tables, then run the migrations"
+        )
+    op.execute(
+        "UPDATE user_exercise_data "
+        "SET workout_date = COALESCE(created_at::date, CURRENT_DATE) "
+        "WHERE workout_date IS NULL"
+    )
+    # Merge duplicate (user, exercise, day) rows into the most recent one,
+    # carrying over the attempts of the rows being removed.
+    op.execute(
+        "UPDATE user_exercise_data AS keep "
+        "SET total_attempts = dup.total_attempts "
+        "FROM ("
+        "  SELECT max(id) AS id, sum(COALESCE(total_attempts, 0)) AS total_attempts "
+        "  FROM user_exercise_data "
+        "  GROUP BY user_id, exercise_name, workout_date "
+        "  HAVING count(*) > 1"
+        ") AS dup "
+        "WHERE keep.id = dup.id"
+    )
+    op.execute(
+        "DELETE FROM user_exercise_data AS older "
+        "USING user_exercise_data AS newer "
+        "WHERE older.user_id = newer.user_id "
+        "AND older.exercise_name = newer.exercise_name "
+        "AND older.workout_date = newer.workout_date "
+        "AND older.id < newer.id"
+    )
+    op.alter_column("user_exercise_data", "workout_date", existing_type=sa.Date(), nullable=False)
+
+    # Built without locking writes; CONCURRENTLY can't run inside a transaction.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_user_exercise_data_user_exercise_date",
+            "user_exercise_data",
+            ["user_id", "exercise_name", "workout_date"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # The composite index leads with user_id, so the single-column one is redundant.
+        op.drop_index(
+            "ix_user_exercise_data_user_id",
+            table_name="user_exercise_data",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_exercise_data_user_id",
+            "user_exercise_data",
+            ["user_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "uq_user_exercise_data_user_exercise_date",
+            table_name="user_exercise_data",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.alter_column("user_exercise_data", "workout_date", existing_type=sa.Date(), nullable=True)
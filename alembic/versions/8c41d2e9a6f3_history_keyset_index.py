@@ -0,0 +1,40 @@
+"""keyset index for user_exercise_data history
+
+Revision ID: 8c41d2e9a6f3
+Revises: 3f2a9c1d4b7e
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d2e9a6f3'
+down_revision: Union[str, None] = '3f2a9c1d4b7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_exercise_data_user_date_id",
+            "user_exercise_data",
+            ["user_id", "workout_date", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_user_exercise_data_user_date_id",
+            table_name="user_exercise_data",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,86 @@
+"""exercise rollup tables
+
+Revision ID: b7e05f3a91c2
+Revises: 8c41d2e9a6f3
+Create Date: 2026-10-18 14:00:00.000000
+
+The rollups are rebuilt from user_exercise_data, counting each existing row
+as a single set with its stored rep count, score and mistakes (the earlier
+attempts of a day are no longer known). Sets logged from now on are counted
+one by one by CRUD.rollups.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e05f3a91c2'
+down_revision: Union[str, None] = '8c41d2e9a6f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BUCKET_COLUMNS = [
+    sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    sa.Column("exercise_name", sa.String(), primary_key=True),
+    sa.Column("period", sa.String(8), primary_key=True),
+    sa.Column("period_start", sa.Date(), primary_key=True),
+]
+SCOPES = ("exercise_name", "'*'")
+PERIOD_STARTS = {
+    "day": "workout_date",
+    "week": "date_trunc('week', workout_date)::date",
+    "all": "DATE '1970-01-01'",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("exercise_rollups"):
+        op.create_table(
+            "exercise_rollups",
+            *[column.copy() for column in BUCKET_COLUMNS],
+            sa.Column("sets", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("scored_sets", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("score_sum", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("rep_total", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("last_updated", sa.DateTime(), nullable=True),
+        )
+    if not inspector.has_table("exercise_mistake_rollups"):
+        op.create_table(
+            "exercise_mistake_rollups",
+            *[column.copy() for column in BUCKET_COLUMNS],
+            sa.Column("mistake", sa.String(), primary_key=True),
+            sa.Column("occurrences", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("percentage_sum", sa.Float(), nullable=False, server_default="0"),
+        )
+
+    op.execute("DELETE FROM exercise_mistake_rollups")
+    op.execute("DELETE FROM exercise_rollups")
+    for scope in SCOPES:
+        for period, start in PERIOD_STARTS.items():
+            op.execute(
+                "INSERT INTO exercise_rollups "
+                "(user_id, exercise_name, period, period_start, sets, scored_sets, score_sum, rep_total, last_updated) "
+                f"SELECT user_id, {scope}, '{period}', {start}, "
+                "count(*), count(score), COALESCE(sum(score), 0), COALESCE(sum(rep_count), 0), now() "
+                "FROM user_exercise_data GROUP BY 1, 2, 3, 4"
+            )
+            op.execute(
+                "INSERT INTO exercise_mistake_rollups "
+                "(user_id, exercise_name, period, period_start, mistake, occurrences, percentage_sum) "
+                f"SELECT user_id, {scope}, '{period}', {start}, m.key, "
+                "count(*) FILTER (WHERE m.value::float > 0), sum(m.value::float) "
+                "FROM user_exercise_data, json_each_text(mistake_percentages) AS m "
+                "WHERE json_typeof(mistake_percentages) = 'object' "
+                "GROUP BY 1, 2, 3, 4, 5"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("exercise_mistake_rollups")
+    op.drop_table("exercise_rollups")
@@ -0,0 +1,49 @@
+"""chat history and rolling summaries
+
+Revision ID: d15a8e2c7b40
+Revises: b7e05f3a91c2
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd15a8e2c7b40'
+down_revision: Union[str, None] = 'b7e05f3a91c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("chat_history"):
+        op.create_table(
+            "chat_history",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("role", sa.String(16), nullable=False),
+            sa.Column("content", sa.Text(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_chat_history_user_created", "chat_history", ["user_id", "created_at"])
+    if not inspector.has_table("chat_summaries"):
+        op.create_table(
+            "chat_summaries",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("summary", sa.Text(), nullable=False, server_default=""),
+            sa.Column("summarized_through_at", sa.DateTime(), nullable=True),
+            sa.Column("summarized_through_id", sa.Integer(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("chat_summaries")
+    op.drop_index("ix_chat_history_user_created", table_name="chat_history")
+    op.drop_table("chat_history")
@@ -1,357 +1,312 @@
-from fastapi import FastAPI, Body
+from fastapi import FastAPI, Body, Request, WebSocket, status
 from fastapi.responses import JSONResponse
-import cv2
-import math
-import mediapipe as mp
-import numpy as np
-import pickle
+from datetime import datetime, timedelta
+from jose import jwt, JWTError
+from dotenv import load_dotenv
+import os
+import httpx
+import logging
 import base64
+import tempfile
+import uuid
+from functools import partial
+from Backend.app.core.batching import MicroBatcher
+from Backend.app.core.exercise_rules import EXERCISE_RULES
+from Backend.app.core.pose_workers import PoseWorkerPool, PoseQueueFull, model_complexity
+from Backend.app.core.rep_counter import RepCounter, exercise_key
+from Backend.app.core.streaming import StreamSession, run_stream
+from Backend.app.core.video import analyze_video
+
+load_dotenv()
+
+# Must match the main API so its access tokens are accepted on the streaming sockets
+SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret-key")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+# Largest video upload accepted by the video endpoint
+VIDEO_MAX_BYTES = int(os.getenv("VIDEO_MAX_BYTES", 500 * 1024 * 1024))
+# Room for multipart boundaries and headers on top of VIDEO_MAX_BYTES
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Main API that stores finished sets in user_exercise_data
+MAIN_API_URL = os.getenv("MAIN_API_URL", "http://localhost:8080")
+MAIN_API_TIMEOUT = float(os.getenv("MAIN_API_TIMEOUT", 10))
+# Lifetime of the token minted for each set write
+MAIN_API_TOKEN_SECONDS = int(os.getenv("MAIN_API_TOKEN_SECONDS", 60))
 
 app = FastAPI()
-# Initialize MediaPipe Pose
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose()
-mp_drawing = mp.solutions.drawing_utils
-
-# Function to calculate angle between three points in 3D
-async def calculate_angle_3d(a, b, c):
-    a = np.array(a)
-    b = np.array(b)
-    c = np.array(c)
-
-    # Vectors
-    ba = a - b
-    bc = c - b
-
-    # Cosine of angle
-    cosine_angle = np.dot(ba, bc) / (np.linalg.norm(ba) * np.linalg.norm(bc))
-    angle = np.arccos(np.clip(cosine_angle, -1.0, 1.0))
-
-    # Convert to degrees
-    return np.degrees(angle)
-
-# Function to calculate distance between 2 landmarks
-async def calculate_distance(point1, point2): 
-    x1, y1, z1 = point1 
-    x2, y2, z2 = point2 
-    distance = math.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2 + (z2 - z1) ** 2) 
-    return distance
-
-# Function to get coordinates
-async def get_coordinates(landmarks, part):
-    return [landmarks[part.value].x, landmarks[part.value].y, landmarks[part.value].z]
-
-# Generic function to handle errors
-async def process_frame(base64_data: str, function):
+logger = logging.getLogger("frameProcessing")
+
+# Run pose estimation on an encoded JPEG/PNG image and evaluate the exercise rules.
+# Frames of a tracking session go to its pinned worker; others are batched.
+async def analyze_image(img_data: bytes, exercise: str, session_id: str | None = None):
+    try:
+        if session_id is None:
+            landmarks = await pose_batcher(exercise).submit(img_data)
+        else:
+            landmarks, = await pose_pool.detect([img_data], session_id=session_id)
+    except PoseQueueFull as e:
+        return {"error": str(e)}, 503
+    except Exception as e:
+        return {"error": str(e)}, 500
+    if landmarks is None:
+        return {"error": "No landmarks detected"}, 400
+    return EXERCISE_RULES[exercise].evaluate_frame(landmarks), 200
+
+# Generic function to handle errors for an encoded JPEG/PNG image
+async def process_image(img_data: bytes, exercise: str):
+    content, status_code = await analyze_image(img_data, exercise)
+    return JSONResponse(content=content, status_code=status_code)
+
+# Function to decode a possibly unpadded base64 string
+def decode_base64(base64_data: str) -> bytes:
+    padding = len(base64_data) % 4
+    if padding != 0:
+        base64_data += '=' * (4 - padding)
+    return base64.b64decode(base64_data)
+
+# Same as process_image for a base64 string sent in a JSON body
+async def process_frame(base64_data: str, exercise: str):
     try:
-        padding = len(base64_data) % 4
-        if padding != 0:
-            base64_data += '=' * (4 - padding)
-
-        # Decode the base64 string
-        img_data = base64.b64decode(base64_data)
-        nparr = np.frombuffer(img_data, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        # Pass the frame to the provided function for processing
-        return await function(frame)
+        # Decode the base64 string; image decoding happens in the pose workers
+        img_data = decode_base64(base64_data)
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
-
-# Function to process pose landmarks
-async def process_pose(frame):
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = pose.process(rgb_frame)
-    if not results.pose_landmarks:
-        return None, JSONResponse(content={"error": "No landmarks detected"}, status_code=400)
-    return results.pose_landmarks.landmark, None
-
-
-# Function to load model
-async def load_model(path):
-    with open(path, 'rb') as base64_data:
-        return pickle.load(base64_data)
+    return await process_image(img_data, exercise)
+
+# Decode and pose estimation run in worker processes, one batch per round trip.
+# Single frames share one batcher per model complexity.
+pose_pool = PoseWorkerPool()
+pose_batchers = {}
+
+def pose_batcher(exercise: str) -> MicroBatcher:
+    complexity = model_complexity(exercise)
+    if complexity not in pose_batchers:
+        pose_batchers[complexity] = MicroBatcher(
+            partial(pose_pool.detect, exercise=exercise), name=f"pose-complexity-{complexity}"
+        )
+    return pose_batchers[complexity]
+
+main_api = httpx.AsyncClient(base_url=MAIN_API_URL, timeout=MAIN_API_TIMEOUT)
+
+@app.on_event("shutdown")
+async def shutdown_pose_pool():
+    pose_pool.shutdown()
+    await main_api.aclose()
+
+@app.get("/metrics/batching")
+async def batching_stats():
+    return {
+        "pose": {batcher.name: batcher.stats() for batcher in pose_batchers.values()},
+        "pose_workers": pose_pool.stats(),
+    }
+
+# With FRAME_CACHE_SIZE set, streaming sessions reuse the previous frame's landmarks for unchanged frames
+@app.get("/metrics/frame-cache")
+async def frame_cache_stats():
+    return await pose_pool.cache_stats()
 
 # Exercise 1: Lateral Raises
 @app.post("/lateral-raises-frame/")
 async def lateralRaises(base64_data: str = Body(..., embed=True)):
-    async def analyze_lateral_raises(frame):
-        landmarks, error = await process_pose(frame)
-        if error: return error
-
-        # Extract points
-        parts = [mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST, mp_pose.PoseLandmark.LEFT_HIP,mp_pose.PoseLandmark.LEFT_KNEE,
-                 mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST, mp_pose.PoseLandmark.RIGHT_HIP, mp_pose.PoseLandmark.RIGHT_KNEE]
-        points = []
-        for part in parts:
-            try:
-                point = await get_coordinates(landmarks, part)
-                if point is None:
-                    return JSONResponse(content={"error": f"Missing landmark {part}"}, status_code=400)
-                points.append(np.array(point))
-            except Exception as e:
-                return JSONResponse(content={"error": f"Landmark error: {str(e)}"}, status_code=500)
-        left_shoulder, left_elbow, left_wrist, left_hip, left_knee  = points[:5]
-        right_shoulder, right_elbow, right_wrist, right_hip, right_knee = points[5:]
-
-        # Angles and flags
-        left_arm_angle = await calculate_angle_3d(left_shoulder, left_elbow, left_wrist)
-        right_arm_angle = await calculate_angle_3d(right_shoulder, right_elbow, right_wrist)
-        hip_angle = await calculate_angle_3d(right_shoulder, right_hip, right_knee)
-        curved_arms= 0
-        standing_upright=0
-        if(left_arm_angle < 100 or right_arm_angle < 100):
-            curved_arms=1
-        if(hip_angle >160):
-            standing_upright=1
-
-        # Detect initial position
-        initial_position = 1 if(await calculate_angle_3d(left_elbow, left_shoulder, left_hip)<30 and await calculate_angle_3d(right_elbow, right_shoulder, right_hip)<30) else 0
-        
-        # Detect breakpoint
-        breakpoint = 1 if(await calculate_angle_3d(left_elbow, left_shoulder, left_hip)>75 and await calculate_angle_3d(right_elbow, right_shoulder, right_hip)>75) else 0
-
-        return JSONResponse(content={
-            "curved_arms": curved_arms,
-            "standing_upright": standing_upright,
-            "breakpoint": breakpoint,
-            "initial_position": initial_position
-        }, status_code=200)
-
-    return await process_frame(base64_data, analyze_lateral_raises)
+    return await process_frame(base64_data, "lateral-raises")
 
 # Exercise 2: Seated Shoulder Press
 @app.post("/shoulder-press-frame/")
 async def ShoulderPress(base64_data: str = Body(..., embed=True)):
-    async def analyze_shoulder_press(frame):
-        landmarks, error = await process_pose(frame)
-        if error: return error
-
-        # Extract points
-        parts = [mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST,
-                 mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST]
-        points = []
-        for part in parts:
-            try:
-                point = await get_coordinates(landmarks, part)
-                if point is None:
-                    return JSONResponse(content={"error": f"Missing landmark {part}"}, status_code=400)
-                points.append(np.array(point))
-            except Exception as e:
-                return JSONResponse(content={"error": f"Landmark error: {str(e)}"}, status_code=500)
-        left_shoulder, left_elbow, left_wrist = points[:3]
-        right_shoulder, right_elbow, right_wrist = points[3:]
-
-        arms_too_wide=0
-        if(calculate_angle_3d(left_shoulder, right_shoulder, right_elbow)>150 or calculate_angle_3d(right_shoulder, left_shoulder, left_elbow)>150):
-            arms_too_wide=1
-
-
-        # Detect initial position
-        initial_position = 1 if(await calculate_angle_3d(left_wrist, left_elbow, left_shoulder)<90 and await calculate_angle_3d(right_wrist, right_elbow, right_shoulder)<90) else 0
-
-        # Detect breakpoint
-        breakpoint = 1 if(await calculate_angle_3d(left_wrist, left_elbow, left_shoulder)>160 and await calculate_angle_3d(right_wrist, right_elbow, right_shoulder)>160) else 0
-
-        return JSONResponse(content={
-            "arms_too_wide": arms_too_wide,
-            "breakpoint": breakpoint,
-            "initial_position": initial_position
-        }, status_code=200)
+    return await process_frame(base64_data, "shoulder-press")
 
-    return await process_frame(base64_data, analyze_shoulder_press)
 # Exercise 3: Cable Lateral Raises
 @app.post("/cable-lateral-raises-frame/")
 async def cableLateralRaises(base64_data: str = Body(..., embed=True)):
-    async def analyze_cable_lateral_raises(frame):
-        landmarks, error = await process_pose(frame)
-        if error: return error
-
-        # Extract points
-        left_shoulder, left_elbow, left_wrist, left_hip = [await get_coordinates(landmarks, part) for part in [mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST, mp_pose.PoseLandmark.LEFT_HIP]]
-        right_shoulder, right_elbow, right_wrist, right_hip = [await get_coordinates(landmarks, part) for part in [mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST, mp_pose.PoseLandmark.RIGHT_HIP]]
-
-        # Angles and flags
-        left_angle = await calculate_angle_3d(left_shoulder, left_elbow, left_wrist)
-        right_angle = await calculate_angle_3d(right_shoulder, right_elbow, right_wrist)
-        bent_arms = int(left_angle < 100 or right_angle < 100)
-
-        #detect leaning body
-        leaning_body= 0
-        if((left_shoulder[1]-left_hip[1])/(left_shoulder[0]-left_hip[0])<20):
-            leaning_body=1
-
-        # Detect initial position
-        initial_position = 1 if(await calculate_angle_3d(left_elbow, left_shoulder, left_hip)<30 and await calculate_angle_3d(right_elbow, right_shoulder, right_hip)<30) else 0
-        
-        # Detect breakpoint
-        breakpoint = 1 if(await calculate_angle_3d(left_elbow, left_shoulder, left_hip)>75 or await calculate_angle_3d(right_elbow, right_shoulder, right_hip)>75) else 0
-
-        return JSONResponse(content={
-            "bent_arms": bent_arms,
-            "leaning_body": leaning_body,
-            "breakpoint": breakpoint,
-            "initial_position": initial_position
-        }, status_code=200)
-
-    return await process_frame(base64_data, analyze_cable_lateral_raises)
+    return await process_frame(base64_data, "cable-lateral-raises")
 
 # Exercise 4: Bench Press
 @app.post("/bench-press-frame/")
 async def benchPress(base64_data: str = Body(..., embed=True)):
-    async def analyze_bench_press(frame):
-        landmarks, error = await process_pose(frame)
-        if error: return error
-
-        # Extract points
-        left_shoulder, left_elbow, left_wrist = [await get_coordinates(landmarks, part) for part in [mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST]]
-        right_shoulder, right_elbow, right_wrist = [await get_coordinates(landmarks, part) for part in [mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST]]
-        right_hip = await get_coordinates(landmarks, mp_pose.PoseLandmark.RIGHT_HIP)
-        # Calculate shoulder width 
-        shoulder_width = await calculate_distance(left_shoulder, right_shoulder)
-
-        # Calculate wrist width 
-        wrist_width = await calculate_distance(left_wrist, right_wrist)
-
-        wrists_too_narrow = 1 if wrist_width < 1.1 * shoulder_width else 0
-
-        # Detect initial position
-        initial_position = 1 if(await calculate_angle_3d(left_wrist, left_elbow, left_shoulder)<90 and await calculate_angle_3d(right_wrist, right_elbow, right_shoulder)<90) else 0
-
-        # Detect breakpoint
-        breakpoint = 1 if(await calculate_angle_3d(left_wrist, left_elbow, left_shoulder)>160 and await calculate_angle_3d(right_wrist, right_elbow, right_shoulder)>160) else 0
-
-        return JSONResponse(content={
-            "wrists_too_narrow": wrists_too_narrow,
-            "breakpoint": breakpoint,
-            "initial_position": initial_position
-        }, status_code=200)
-
-    return await process_frame(base64_data, analyze_bench_press)
+    return await process_frame(base64_data, "bench-press")
 
 # Exercise 5: Inclined Dumbbell Press
 @app.post("/inclined-dumbbell-press-frame/")
 async def inclinedDumbbellPress(base64_data: str = Body(..., embed=True)):
-    async def analyze_inclined_press(frame):
-        landmarks, error = await process_pose(frame)
-        if error: return error
-
-        # Extract points
-        parts = [mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST, mp_pose.PoseLandmark.LEFT_HIP,
-                 mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST, mp_pose.PoseLandmark.RIGHT_HIP]
-        points = []
-        for part in parts:
-            try:
-                point = await get_coordinates(landmarks, part)
-                if point is None:
-                    return JSONResponse(content={"error": f"Missing landmark {part}"}, status_code=400)
-                points.append(np.array(point))
-            except Exception as e:
-                return JSONResponse(content={"error": f"Landmark error: {str(e)}"}, status_code=500)
-        left_shoulder, left_elbow, left_wrist, left_hip = points[:4]
-        right_shoulder, right_elbow, right_wrist, right_hip = points[4:]
-
-        # Angles and flags
-        left_angle = await calculate_angle_3d(left_elbow, left_shoulder, left_hip)
-        right_angle = await calculate_angle_3d(right_elbow, right_shoulder, right_hip)
-        flared_elbows = int(left_angle > 45 or right_angle > 45)
-
-        # Detect initial position
-        initial_position = 1 if(await calculate_angle_3d(left_wrist, left_elbow, left_shoulder)<90 and await calculate_angle_3d(right_wrist, right_elbow, right_shoulder)<90) else 0
-
-        # Detect breakpoint
-        breakpoint = 1 if(await calculate_angle_3d(left_wrist, left_elbow, left_shoulder)>170 and await calculate_angle_3d(right_wrist, right_elbow, right_shoulder)>170) else 0
-
-        return JSONResponse(content={
-            "flared_elbows": flared_elbows,
-            "breakpoint": breakpoint,
-            "initial_position": initial_position
-        }, status_code=200)
-
-    return await process_frame(base64_data, analyze_inclined_press)
+    return await process_frame(base64_data, "inclined-dumbbell-press")
 
 # Exercise 6: Cable Crossover
 @app.post("/cable-crossover-frame/")
 async def cableCrossover(base64_data: str = Body(..., embed=True)):
-    async def analyze_cable_crossover(frame):
-        landmarks, error = await process_pose(frame)
-        if error: return error
-
-        # Extract points
-        parts = [mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST, mp_pose.PoseLandmark.LEFT_HIP,
-                 mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST, mp_pose.PoseLandmark.RIGHT_HIP]
-        points = []
-        for part in parts:
-            try:
-                point = await get_coordinates(landmarks, part)
-                if point is None:
-                    return JSONResponse(content={"error": f"Missing landmark {part}"}, status_code=400)
-                points.append(np.array(point))
-            except Exception as e:
-                return JSONResponse(content={"error": f"Landmark error: {str(e)}"}, status_code=500)
-        left_shoulder, left_elbow, left_wrist, left_hip = points[:4]
-        right_shoulder, right_elbow, right_wrist, right_hip = points[4:]
-
-        # Detect initial position
-        initial_position = 0
-
-        if(await calculate_angle_3d(left_elbow, left_shoulder, left_hip)>90 and await calculate_angle_3d(right_elbow, right_shoulder, right_hip)>90):
-            initial_position=1
-        breakpoint =0
-        if(await calculate_angle_3d(left_elbow, left_shoulder, left_hip)<60 and await calculate_angle_3d(right_elbow, right_shoulder, right_hip)<60):
-            breakpoint=1
-        bent_arms_at_breakpoint=0
-
-        #detect bent arms at breakpoint
-        if(breakpoint==1 and (calculate_angle_3d(left_wrist, left_elbow, left_shoulder)<160 or
-                               calculate_angle_3d(right_wrist, right_elbow, right_shoulder)<160)):
-            bent_arms_at_breakpoint=1
-        
-        return JSONResponse(content={
-            "bent_arms_at_breakpoint": bent_arms_at_breakpoint,
-            "breakpoint": breakpoint,
-            "initial_position": initial_position
-        }, status_code=200)
-
-    return await process_frame(base64_data, analyze_cable_crossover)
+    return await process_frame(base64_data, "cable-crossover")
 
 # Exercise 7: Rope Overhead Extensions
 @app.post("/rope-overhead-extensions-frame/")
 async def ropeOverheadExtensions(base64_data: str = Body(..., embed=True)):
-    async def analyze_rope_extensions(frame):
-        landmarks, error = await process_pose(frame)
-        if error: return error
-
-        # Extract points
-        parts = [mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST,
-                 mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST]
-        points = []
-        for part in parts:
+    return await process_frame(base64_data, "rope-overhead-extensions")
+
+# Raw image upload for every exercise: send the JPEG/PNG bytes as the body with
+# Content-Type application/octet-stream, or as the "file" field of a multipart form.
+# This skips the base64 inflation and the intermediate string of the JSON endpoints.
+@app.post("/{exercise}-frame/binary/")
+async def binaryFrame(exercise: str, request: Request):
+    if exercise not in EXERCISE_RULES:
+        return JSONResponse(content={"error": f"Unknown exercise '{exercise}'"}, status_code=404)
+
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            return JSONResponse(content={"error": "Missing 'file' upload"}, status_code=400)
+        img_data = await upload.read()
+    else:
+        img_data = await request.body()
+
+    if not img_data:
+        return JSONResponse(content={"error": "Empty image body"}, status_code=400)
+    return await process_image(img_data, exercise)
+
+class UploadTooLarge(Exception):
+    pass
+
+# Wrap an ASGI receive so reading more than limit body bytes raises UploadTooLarge
+def limit_receive(receive, limit: int):
+    received = 0
+
+    async def limited():
+        nonlocal received
+        message = await receive()
+        received += len(message.get("body", b""))
+        if received > limit:
+            raise UploadTooLarge()
+        return message
+
+    return limited
+
+# Whole-video analysis for recorded sets: send the video as the body
+# (application/octet-stream) or as the "file" field of a multipart form.
+# The upload is spooled to a temporary file and split into contiguous segments,
+# one per pose worker, each decoded and tracked in parallel; ?every_nth=N
+# analyzes one frame in N. Returns a per-frame timeline plus the rep and mistake summary.
+@app.post("/{exercise}-video/")
+async def analyzeVideo(exercise: str, request: Request, every_nth: int = 1, max_frames: int | None = None):
+    if exercise not in EXERCISE_RULES:
+        return JSONResponse(content={"error": f"Unknown exercise '{exercise}'"}, status_code=404)
+    if every_nth < 1:
+        return JSONResponse(content={"error": "every_nth must be at least 1"}, status_code=400)
+
+    too_large = JSONResponse(content={"error": "Video too large"}, status_code=413)
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > VIDEO_MAX_BYTES + MULTIPART_OVERHEAD_BYTES:
+        return too_large
+
+    with tempfile.NamedTemporaryFile(suffix=".video") as video:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            # The form parser spools the whole upload, so cap what it may read
+            limited = Request(request.scope, limit_receive(request.receive, VIDEO_MAX_BYTES + MULTIPART_OVERHEAD_BYTES))
             try:
-                point = await get_coordinates(landmarks, part)
-                if point is None:
-                    return JSONResponse(content={"error": f"Missing landmark {part}"}, status_code=400)
-                points.append(np.array(point))
-            except Exception as e:
-                return JSONResponse(content={"error": f"Landmark error: {str(e)}"}, status_code=500)
-        left_shoulder, left_elbow, left_wrist = points[:3]
-        right_shoulder, right_elbow, right_wrist = points[3:]
-
-        # Angles and flags
-        left_shoulder_angle = await calculate_angle_3d(right_shoulder, left_shoulder, left_elbow)
-        right_shoulder_angle = await calculate_angle_3d(left_shoulder, right_shoulder, right_elbow)
-        flared_elbows = int(left_shoulder_angle > 90 or right_shoulder_angle > 90)
-
-        # Detect initial position
-        initial_position = 1 if(await calculate_angle_3d(left_wrist, left_elbow, left_shoulder)<80 and await calculate_angle_3d(right_wrist, right_elbow, right_shoulder)<80) else 0
-
-        # Detect breakpoint
-        breakpoint = 1 if(await calculate_angle_3d(left_wrist, left_elbow, left_shoulder)>170 and await calculate_angle_3d(right_wrist, right_elbow, right_shoulder)>170) else 0
-
-        return JSONResponse(content={
-            "flared_elbows": flared_elbows,
-            "breakpoint": breakpoint,
-            "initial_position": initial_position
-        }, status_code=200)
-
-    return await process_frame(base64_data, analyze_rope_extensions)
+                form = await limited.form()
+            except UploadTooLarge:
+                return too_large
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                return JSONResponse(content={"error": "Missing 'file' upload"}, status_code=400)
+            while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+                video.write(chunk)
+                if video.tell() > VIDEO_MAX_BYTES:
+                    return too_large
+        else:
+            async for chunk in request.stream():
+                video.write(chunk)
+                if video.tell() > VIDEO_MAX_BYTES:
+                    return too_large
+        if video.tell() == 0:
+            return JSONResponse(content={"error": "Empty video body"}, status_code=400)
+        video.flush()
+
+        try:
+            result = await analyze_video(video.name, exercise, pose_pool, every_nth=every_nth, max_frames=max_frames)
+        except ValueError as e:
+            return JSONResponse(content={"error": str(e)}, status_code=400)
+        except PoseQueueFull as e:
+            return JSONResponse(content={"error": str(e)}, status_code=503)
+    return JSONResponse(content=result, status_code=200)
+
+# Function to get the user id from an access token, or None if it is invalid
+def verify_token(token: str):
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
+        return None
+
+# Short-lived token for writing a set as the session's user. The socket's own
+# token was only checked at connect time and may have expired by the end of a
+# long session, so it is not replayed.
+def set_token(user_id: int) -> str:
+    expire = datetime.utcnow() + timedelta(seconds=MAIN_API_TOKEN_SECONDS)
+    return jwt.encode({"sub": str(user_id), "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+# Write the session's set aggregate to user_exercise_data through the main API,
+# as the streaming user, and start a new set. Returns the summary, or None if
+# the set has no frames.
+async def save_set(session: StreamSession):
+    counter = session.state["reps"]
+    if not counter.frames:
+        return None
+    summary = counter.summary()
+    session.state["reps"] = RepCounter(session.exercise)
+    try:
+        response = await main_api.put(
+            f"/Exercise/{exercise_key(session.exercise)}",
+            json={
+                "rep_count": summary["rep_count"],
+                "mistake_percentages": summary["mistake_percentages"],
+                "score": summary["score"],
+            },
+            headers={"Authorization": f"Bearer {set_token(session.user_id)}"},
+        )
+        response.raise_for_status()
+        summary["saved"] = True
+    except httpx.HTTPStatusError as e:
+        # 401: the main API rejected the token (a different SECRET_KEY, or the user was deleted)
+        logger.error(
+            "Main API refused the %s set of user %s: %s %s",
+            session.exercise, session.user_id, e.response.status_code, e.response.text,
+        )
+        summary["saved"] = False
+    except httpx.HTTPError as e:
+        logger.error("Failed to save the %s set of user %s: %r", session.exercise, session.user_id, e)
+        summary["saved"] = False
+    return summary
+
+async def analyze_message(session: StreamSession, message):
+    if isinstance(message, dict) and message.get("action") == "finish":
+        # End of set: store the aggregate and start a new set
+        return {"summary": await save_set(session)}
+
+    counter = session.state["reps"]
+
+    img_data = message if isinstance(message, bytes) else decode_base64(message["base64_data"])
+    result, _ = await analyze_image(img_data, session.exercise, session.state["pose_session"])
+    return {**result, "rep_count": counter.update(result)}
+
+# Streaming analysis: authenticate once with ?token=, then send binary JPEG/PNG
+# frames (or JSON {"base64_data": ...}) and read per-frame feedback on the same
+# socket. Frames that arrive while one is being analyzed are dropped except the newest.
+# Reps and mistake ratios are tracked server-side; {"action": "finish"} saves the set
+# to the main API and returns its summary. A set still open when the socket closes is saved too.
+# Each connection gets its own pose tracker, so MediaPipe tracks between frames
+# instead of re-detecting the person on every one.
+@app.websocket("/{exercise}-frame/ws")
+async def streamFrames(websocket: WebSocket, exercise: str, token: str | None = None):
+    user_id = verify_token(token) if token else None
+    if exercise not in EXERCISE_RULES or user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    session = StreamSession(websocket, exercise, user_id)
+    session.state["reps"] = RepCounter(exercise)
+    session.state["pose_session"] = uuid.uuid4().hex
+    pose_pool.open_session(session.state["pose_session"], exercise)
+    try:
+        await run_stream(session, analyze_message)
+    finally:
+        await pose_pool.close_session(session.state["pose_session"])
+        await save_set(session)
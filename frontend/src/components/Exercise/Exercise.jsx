@@ -192,12 +192,16 @@ const calculateAngle = (a, b, c) => {
 
 const getCoordinates = (landmarks, part) => {
   if (!landmarks || landmarks.length <= part || !landmarks[part]) {
-    return { x: 0, y: 0, z: 0 }
+    return { x: 0, y: 0, z: 0, visibility: 0, landmark: part }
   }
+  // The plank and lunges classifiers were trained on visibility as well; the
+  // landmark index lets the server put points in each model's training order.
   return {
+    landmark: part,
     x: landmarks[part].x,
     y: landmarks[part].y,
     z: landmarks[part].z,
+    visibility: landmarks[part].visibility ?? 0,
   }
 }
 